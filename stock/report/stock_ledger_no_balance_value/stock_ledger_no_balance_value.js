@@ -0,0 +1,98 @@
+frappe.query_reports["Stock Ledger No Balance Value"] = {
+    "filters": [
+        {
+            fieldname: "company",
+            label: __("Company"),
+            fieldtype: "Link",
+            options: "Company",
+            default: frappe.defaults.get_user_default("Company"),
+            reqd: 1
+        },
+        {
+            fieldname: "from_date",
+            label: __("From Date"),
+            fieldtype: "Date",
+            default: frappe.datetime.add_months(frappe.datetime.get_today(), -1),
+            reqd: 1
+        },
+        {
+            fieldname: "to_date",
+            label: __("To Date"),
+            fieldtype: "Date",
+            default: frappe.datetime.get_today(),
+            reqd: 1
+        },
+        {
+            fieldname: "warehouse",
+            label: __("Warehouse"),
+            fieldtype: "Link",
+            options: "Warehouse"
+        },
+        {
+            fieldname: "item_code",
+            label: __("Item"),
+            fieldtype: "Link",
+            options: "Item"
+        },
+        {
+            fieldname: "item_group",
+            label: __("Item Group"),
+            fieldtype: "Link",
+            options: "Item Group"
+        },
+        {
+            fieldname: "brand",
+            label: __("Brand"),
+            fieldtype: "Link",
+            options: "Brand"
+        },
+        {
+            fieldname: "voucher_no",
+            label: __("Voucher #"),
+            fieldtype: "Data"
+        },
+        {
+            fieldname: "batch_no",
+            label: __("Batch"),
+            fieldtype: "Link",
+            options: "Batch"
+        },
+        {
+            fieldname: "project",
+            label: __("Project"),
+            fieldtype: "Link",
+            options: "Project"
+        },
+        {
+            // Rows per page; 0 shows the whole range
+            fieldname: "page_length",
+            label: __("Rows Per Page"),
+            fieldtype: "Int",
+            default: 500
+        },
+        {
+            fieldname: "page",
+            label: __("Page"),
+            fieldtype: "Int",
+            default: 1,
+            depends_on: "eval:doc.page_length > 0"
+        }
+    ],
+
+    // The report ships into ERPNext's stock module, hence the erpnext.stock path
+    onload: function(report) {
+        report.page.add_inner_button(__("Export CSV"), function() {
+            frappe.call({
+                method: "erpnext.stock.report.stock_ledger_no_balance_value.stock_ledger_no_balance_value.export_csv",
+                args: { filters: report.get_values() },
+                freeze: true,
+                freeze_message: __("Exporting..."),
+                callback: function(r) {
+                    if (r.message) {
+                        window.open(r.message.file_url);
+                    }
+                }
+            });
+        });
+    }
+};
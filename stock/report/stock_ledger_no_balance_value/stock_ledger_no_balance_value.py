@@ -1,33 +1,154 @@
+import csv
+import json
+import os
+from itertools import islice
+
 import frappe
-from erpnext.stock.report.stock_ledger.stock_ledger import execute as original_execute
+from frappe import _
+from frappe.utils import cint, getdate
+
+CHUNK_SIZE = 5000
+
+# (fieldname, label, fieldtype, options, width, select expression). Valuation
+# columns (incoming/valuation rate, value difference, balance value) are never
+# selected, and the SELECT list follows this order so each fetched row is
+# already a report row.
+COLUMNS = (
+    ("date", "Date", "Datetime", None, 150, "TIMESTAMP(sle.posting_date, sle.posting_time)"),
+    ("item_code", "Item", "Link", "Item", 100, "sle.item_code"),
+    ("item_name", "Item Name", "Data", None, 100, "item.item_name"),
+    ("stock_uom", "Stock UOM", "Link", "UOM", 90, "item.stock_uom"),
+    ("in_qty", "In Qty", "Float", None, 80, "GREATEST(sle.actual_qty, 0)"),
+    ("out_qty", "Out Qty", "Float", None, 80, "LEAST(sle.actual_qty, 0)"),
+    ("qty_after_transaction", "Balance Qty", "Float", None, 100, "sle.qty_after_transaction"),
+    ("warehouse", "Warehouse", "Link", "Warehouse", 150, "sle.warehouse"),
+    ("item_group", "Item Group", "Link", "Item Group", 100, "item.item_group"),
+    ("brand", "Brand", "Link", "Brand", 100, "item.brand"),
+    ("description", "Description", "Data", None, 200, "item.description"),
+    ("voucher_type", "Voucher Type", "Data", None, 110, "sle.voucher_type"),
+    ("voucher_no", "Voucher #", "Dynamic Link", "voucher_type", 100, "sle.voucher_no"),
+    ("batch_no", "Batch", "Link", "Batch", 100, "sle.batch_no"),
+    ("serial_no", "Serial No", "Data", None, 100, "sle.serial_no"),
+    ("project", "Project", "Link", "Project", 100, "sle.project"),
+    ("company", "Company", "Link", "Company", 110, "sle.company")
+)
+
 
 def execute(filters=None):
-    columns, data = original_execute(filters)
-    
-    # Filter out unwanted columns
-    unwanted_labels = {
-        "Incoming Rate", 
-        "Valuation Rate", 
-        "Balance Value", 
-        "Value Difference", 
-        "Avg Rate"
+    filters = frappe._dict(filters or {})
+    columns = get_columns()
+
+    page_length = cint(filters.get("page_length"))
+    start = max(cint(filters.get("page")) - 1, 0) * page_length
+    data = [list(row) for chunk in iter_ledger_chunks(filters, start=start, limit=page_length) for row in chunk]
+
+    message = None
+    if page_length:
+        message = _("Showing rows {0} to {1}").format(start + 1, start + len(data))
+
+    return columns, data, message
+
+
+def get_columns():
+    columns = []
+    for fieldname, label, fieldtype, options, width, expression in COLUMNS:
+        column = {"fieldname": fieldname, "label": _(label), "fieldtype": fieldtype, "width": width}
+        if options:
+            column["options"] = options
+        columns.append(column)
+    return columns
+
+
+def get_conditions(filters):
+    conditions = ["sle.is_cancelled = 0"]
+    params = {
+        "from_date": getdate(filters.get("from_date")),
+        "to_date": getdate(filters.get("to_date"))
     }
+    conditions.append("sle.posting_date BETWEEN %(from_date)s AND %(to_date)s")
+
+    for fieldname in ("company", "item_code", "voucher_no", "batch_no", "project"):
+        if filters.get(fieldname):
+            conditions.append(f"sle.{fieldname} = %({fieldname})s")
+            params[fieldname] = filters.get(fieldname)
+
+    if filters.get("brand"):
+        conditions.append("item.brand = %(brand)s")
+        params["brand"] = filters.get("brand")
+
+    # A group item group or warehouse covers its whole subtree, as in the standard Stock Ledger
+    if filters.get("item_group"):
+        lft, rgt = frappe.db.get_value("Item Group", filters.get("item_group"), ["lft", "rgt"]) or (0, 0)
+        conditions.append("""item.item_group IN (
+            SELECT name FROM `tabItem Group` WHERE lft >= %(item_group_lft)s AND rgt <= %(item_group_rgt)s
+        )""")
+        params.update({"item_group_lft": lft, "item_group_rgt": rgt})
+
+    if filters.get("warehouse"):
+        lft, rgt = frappe.db.get_value("Warehouse", filters.get("warehouse"), ["lft", "rgt"]) or (0, 0)
+        conditions.append("""sle.warehouse IN (
+            SELECT name FROM `tabWarehouse` WHERE lft >= %(lft)s AND rgt <= %(rgt)s
+        )""")
+        params.update({"lft": lft, "rgt": rgt})
+
+    return " AND ".join(conditions), params
+
+
+def get_ledger_query(filters, start=0, limit=0):
+    conditions, params = get_conditions(filters)
+    select = ",\n            ".join(f"{expression} AS {fieldname}" for fieldname, *_rest, expression in COLUMNS)
+    query = f"""
+        SELECT
+            {select}
+        FROM `tabStock Ledger Entry` sle
+        INNER JOIN `tabItem` item ON item.name = sle.item_code
+        WHERE {conditions}
+        ORDER BY sle.posting_date, sle.posting_time, sle.creation
+    """
+    if limit:
+        query += f" LIMIT {cint(limit)} OFFSET {cint(start)}"
+    return query, params
+
+
+def iter_ledger_chunks(filters, start=0, limit=0, chunk_size=CHUNK_SIZE):
+    """Yield ledger rows (tuples in COLUMNS order) in chunks from an unbuffered cursor"""
+    query, params = get_ledger_query(filters, start=start, limit=limit)
+    with frappe.db.unbuffered_cursor():
+        rows = frappe.db.sql(query, params, as_iterator=True)
+        while chunk := list(islice(rows, chunk_size)):
+            yield chunk
+
+
+@frappe.whitelist()
+def export_csv(filters):
+    """Write the ledger to a private CSV File chunk by chunk and return its URL
 
-    # Find indexes of unwanted columns
-    unwanted_indexes = [
-        i for i, col in enumerate(columns)
-        if col.get("label") in unwanted_labels
-    ]
+    Rows go from the unbuffered cursor straight to disk, so neither the rows nor
+    the CSV text are held in memory whole.
+    """
+    if isinstance(filters, str):
+        filters = json.loads(filters)
+    filters = frappe._dict(filters or {})
+    frappe.has_permission("Stock Ledger Entry", throw=True)
 
-    # Filter columns
-    filtered_columns = [
-        col for i, col in enumerate(columns) if i not in unwanted_indexes
-    ]
+    file_name = f"stock_ledger_no_balance_value_{frappe.generate_hash(length=8)}.csv"
+    path = frappe.get_site_path("private", "files", file_name)
+    row_count = 0
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow([_(label) for _fieldname, label, *_rest in COLUMNS])
+        for chunk in iter_ledger_chunks(filters):
+            writer.writerows(chunk)
+            row_count += len(chunk)
 
-    # Filter data rows
-    filtered_data = [
-        [val for i, val in enumerate(row) if i not in unwanted_indexes]
-        for row in data
-    ]
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": file_name,
+        "file_url": f"/private/files/{file_name}",
+        "is_private": 1,
+        "file_size": os.path.getsize(path)
+    })
+    file_doc.flags.ignore_permissions = True
+    file_doc.insert()
 
-    return filtered_columns, filtered_data
+    return {"file_url": file_doc.file_url, "rows": row_count}
@@ -0,0 +1,243 @@
+"""Synthetic data for benchmarking the ordering endpoints on a test site
+
+Everything seeded is named with the BENCH- prefix (or the benchmark supplier)
+so `clear_benchmark_data` can remove it again.
+"""
+import random
+
+import frappe
+from frappe.utils import add_days, getdate, now, nowdate
+
+from upande_timaflor.farms import clear_farm_registry, get_farm_fieldname
+from upande_timaflor.upande_timaflor.doctype.farm_daily_consumption.farm_daily_consumption import (
+    rebuild_farm_daily_consumption
+)
+from upande_timaflor.upande_timaflor.doctype.farm_weekly_consumption.farm_weekly_consumption import (
+    refresh_weekly_consumption
+)
+
+PREFIX = "BENCH-"
+BENCHMARK_SUPPLIER = "BENCH Supplier"
+BENCHMARK_RFQ = "BENCH-RFQ-0001"
+FARMS = ("Tima1", "Tima2", "Tima3", "Tima4", "Tima5", "Tima6", "Tima7", "Jangwani")
+ITEM_GROUPS = ("Fertilizer", "Chemical")
+CHUNK_SIZE = 5000
+
+
+def check_test_site():
+    if not frappe.conf.get("allow_tests"):
+        frappe.throw("Benchmark data can only be seeded on a site with allow_tests enabled")
+
+
+def seed_benchmark_data(items=200, sle_rows=100000, days=365, suppliers=10, seed=42):
+    """Seed Items, farm Warehouses, Bins, Stock Ledger Entries and supplier quotations
+
+    Returns the volumes seeded. Rollups are rebuilt for the seeded window so the
+    consumption endpoints read realistic data.
+    """
+    check_test_site()
+    rng = random.Random(seed)
+    company = frappe.defaults.get_defaults().get("company") or frappe.db.get_value("Company", {}, "name")
+
+    item_codes = seed_items(items)
+    warehouses = seed_warehouses(company)
+    seed_bins(item_codes, warehouses, rng)
+    seed_stock_ledger(item_codes, warehouses, sle_rows, days, company, rng)
+    seed_quotations(item_codes, suppliers, rng)
+    frappe.db.commit()
+
+    from_date = add_days(nowdate(), -days)
+    rebuild_farm_daily_consumption(from_date, nowdate())
+    refresh_weekly_consumption(from_date, nowdate())
+    clear_farm_registry()
+    frappe.db.commit()
+
+    return {"items": len(item_codes), "warehouses": len(warehouses), "sle_rows": sle_rows, "days": days,
+            "suppliers": suppliers}
+
+
+def get_timestamps():
+    timestamp = now()
+    return timestamp, timestamp, frappe.session.user, frappe.session.user
+
+
+def seed_items(count):
+    stock_uom = frappe.db.get_value("UOM", {}, "name") or "Nos"
+    values = []
+    item_codes = []
+    for i in range(count):
+        item_group = ITEM_GROUPS[i % len(ITEM_GROUPS)]
+        item_code = f"{PREFIX}{item_group[:4].upper()}-{i:05d}"
+        item_codes.append(item_code)
+        values.append((item_code, *get_timestamps(), item_code, item_code, item_group, stock_uom, 1, 0))
+
+    frappe.db.bulk_insert(
+        "Item",
+        ["name", "creation", "modified", "owner", "modified_by", "item_code", "item_name", "item_group",
+         "stock_uom", "is_stock_item", "disabled"],
+        values,
+        ignore_duplicates=True
+    )
+    return item_codes
+
+
+def seed_warehouses(company):
+    """One fertilizer and one chemical store per farm, linked to the farm"""
+    abbr = frappe.get_cached_value("Company", company, "abbr")
+    parent = frappe.db.get_value("Warehouse", {"is_group": 1, "company": company}, "name")
+
+    warehouses = {}
+    for farm in FARMS:
+        if not frappe.db.exists("Farm", farm):
+            frappe.db.sql("""
+                INSERT IGNORE INTO `tabFarm` (name, creation, modified, owner, modified_by)
+                VALUES (%s, %s, %s, %s, %s)
+            """, (farm, *get_timestamps()))
+
+        for item_group in ITEM_GROUPS:
+            warehouse_name = f"{PREFIX}{item_group} Store {farm}"
+            name = f"{warehouse_name} - {abbr}"
+            if not frappe.db.exists("Warehouse", name):
+                frappe.get_doc({
+                    "doctype": "Warehouse",
+                    "warehouse_name": warehouse_name,
+                    "parent_warehouse": parent,
+                    "company": company,
+                    "farm": farm,
+                    "farm_store_item_groups": [{"item_group": item_group}]
+                }).insert(ignore_permissions=True)
+            warehouses[name] = get_farm_fieldname(farm)
+    return list(warehouses)
+
+
+def seed_bins(item_codes, warehouses, rng):
+    values = []
+    for item_code in item_codes:
+        for warehouse in warehouses:
+            actual_qty = rng.randint(0, 500)
+            ordered_qty = rng.choice((0, 0, 0, rng.randint(1, 200)))
+            values.append((
+                f"{PREFIX}BIN-{frappe.generate_hash(length=12)}", *get_timestamps(),
+                item_code, warehouse, actual_qty, ordered_qty, 0, actual_qty + ordered_qty
+            ))
+
+    frappe.db.bulk_insert(
+        "Bin",
+        ["name", "creation", "modified", "owner", "modified_by", "item_code", "warehouse",
+         "actual_qty", "ordered_qty", "reserved_qty", "projected_qty"],
+        values,
+        chunk_size=CHUNK_SIZE
+    )
+
+
+def seed_stock_ledger(item_codes, warehouses, rows, days, company, rng):
+    """Mostly small issues with periodic receipts, spread over the last `days` days"""
+    start = getdate(add_days(nowdate(), -days))
+    fields = ["name", "creation", "modified", "owner", "modified_by", "docstatus", "item_code", "warehouse",
+              "posting_date", "posting_time", "actual_qty", "qty_after_transaction", "is_cancelled",
+              "voucher_type", "voucher_no", "company"]
+
+    for offset in range(0, rows, CHUNK_SIZE):
+        values = []
+        for n in range(offset, min(offset + CHUNK_SIZE, rows)):
+            actual_qty = rng.randint(50, 400) if rng.random() < 0.1 else -rng.randint(1, 25)
+            values.append((
+                f"{PREFIX}SLE-{n:09d}", *get_timestamps(), 1,
+                rng.choice(item_codes), rng.choice(warehouses),
+                add_days(start, rng.randrange(days + 1)), f"{rng.randrange(6, 18):02d}:{rng.randrange(60):02d}:00",
+                actual_qty, 0, 0, "Stock Entry", f"{PREFIX}SE-{n // 10:08d}", company
+            ))
+        frappe.db.bulk_insert("Stock Ledger Entry", fields, values, chunk_size=CHUNK_SIZE)
+        frappe.db.commit()
+
+
+def seed_quotations(item_codes, suppliers, rng):
+    """One RFQ for the first 50 items, quoted by every benchmark supplier (some items twice)"""
+    rfq_items = item_codes[:50]
+    supplier_group = frappe.db.get_value("Supplier Group", {}, "name")
+    supplier_names = []
+    for supplier_name in [BENCHMARK_SUPPLIER] + [f"{PREFIX}Supplier {i:03d}" for i in range(1, suppliers)]:
+        supplier = frappe.db.get_value("Supplier", {"supplier_name": supplier_name}, "name")
+        if not supplier:
+            supplier = frappe.get_doc({
+                "doctype": "Supplier",
+                "supplier_name": supplier_name,
+                "supplier_group": supplier_group
+            }).insert(ignore_permissions=True, ignore_mandatory=True).name
+        supplier_names.append(supplier)
+
+    frappe.db.bulk_insert(
+        "Request for Quotation Item",
+        ["name", "creation", "modified", "owner", "modified_by", "parent", "parenttype", "parentfield",
+         "idx", "item_code", "item_name", "qty", "uom"],
+        [(f"{PREFIX}RFQI-{i:05d}", *get_timestamps(), BENCHMARK_RFQ, "Request for Quotation", "items",
+          i + 1, item_code, item_code, rng.randint(10, 500), "Nos") for i, item_code in enumerate(rfq_items)],
+        ignore_duplicates=True
+    )
+
+    quotations, quotation_items = [], []
+    for s, supplier in enumerate(supplier_names):
+        quotation = f"{PREFIX}SQ-{s:04d}"
+        quotations.append((quotation, *get_timestamps(), 1, supplier, 1000, 1160))
+        for i, item_code in enumerate(rfq_items):
+            for repeat in range(rng.choice((1, 1, 2))):
+                rate = rng.uniform(10, 100)
+                quotation_items.append((
+                    f"{PREFIX}SQI-{s:04d}-{i:05d}-{repeat}", *get_timestamps(), quotation, "Supplier Quotation",
+                    "items", i + 1, item_code, 1, rate, rate, rate, rng.randint(3, 30), BENCHMARK_RFQ
+                ))
+
+    frappe.db.bulk_insert(
+        "Supplier Quotation",
+        ["name", "creation", "modified", "owner", "modified_by", "docstatus", "supplier", "base_net_total",
+         "base_grand_total"],
+        quotations,
+        ignore_duplicates=True
+    )
+    frappe.db.bulk_insert(
+        "Supplier Quotation Item",
+        ["name", "creation", "modified", "owner", "modified_by", "parent", "parenttype", "parentfield",
+         "idx", "item_code", "qty", "rate", "base_rate", "base_net_rate", "lead_time_days",
+         "request_for_quotation"],
+        quotation_items,
+        chunk_size=CHUNK_SIZE,
+        ignore_duplicates=True
+    )
+
+
+def get_benchmark_supplier():
+    return frappe.db.get_value("Supplier", {"supplier_name": BENCHMARK_SUPPLIER}, "name")
+
+
+def clear_benchmark_data():
+    """Remove everything seeded by `seed_benchmark_data` and the documents the benchmark created"""
+    check_test_site()
+    like = f"{PREFIX}%"
+
+    supplier = get_benchmark_supplier()
+    if supplier:
+        for purchase_order in frappe.get_all("Purchase Order", filters={"supplier": supplier}, pluck="name"):
+            frappe.db.delete("Purchase Order Item", {"parent": purchase_order})
+            frappe.db.delete("Purchase Order", {"name": purchase_order})
+        for sheet in frappe.get_all("Ordering Sheet", filters={"supplier": supplier}, pluck="name"):
+            frappe.db.delete("Order Quantity", {"parent": sheet, "parenttype": "Ordering Sheet"})
+            frappe.db.delete("Ordering Sheet", {"name": sheet})
+
+    for doctype, field in (
+        ("Farm Daily Consumption", "item_code"),
+        ("Farm Weekly Consumption", "item_code"),
+        ("Stock Ledger Entry", "name"),
+        ("Bin", "name"),
+        ("Supplier Quotation Item", "name"),
+        ("Supplier Quotation", "name"),
+        ("Request for Quotation Item", "name"),
+        ("Item", "name"),
+        ("Supplier", "supplier_name"),
+        ("Farm Store Item Group", "parent"),
+        ("Warehouse", "name")
+    ):
+        frappe.db.delete(doctype, {field: ("like", like)})
+    frappe.db.delete("Supplier", {"supplier_name": BENCHMARK_SUPPLIER})
+
+    clear_farm_registry()
+    frappe.db.commit()
@@ -0,0 +1,196 @@
+"""Time the ordering endpoints and reports against seeded data
+
+Results are written as JSON with --output. Latency depends on the site's
+hardware and data, so no baseline is shipped: pass an earlier run's output
+from the same site as --baseline to catch regressions.
+"""
+import importlib.util
+import json
+import os
+import time
+
+import frappe
+from frappe.utils import add_days, now, nowdate
+
+from upande_timaflor.benchmarks.generator import BENCHMARK_RFQ, PREFIX, get_benchmark_supplier
+from upande_timaflor.consumption import percentile
+from upande_timaflor.instrumentation import count_queries
+
+DEFAULT_ITERATIONS = 5
+REGRESSION_TOLERANCE = 0.2
+
+
+def load_stock_ledger_report():
+    """The Stock Ledger No Balance Value report lives beside the app package, not inside it"""
+    path = os.path.join(
+        frappe.get_app_path("upande_timaflor"), "..", "stock", "report",
+        "stock_ledger_no_balance_value", "stock_ledger_no_balance_value.py"
+    )
+    if not os.path.exists(path):
+        return None
+    spec = importlib.util.spec_from_file_location("stock_ledger_no_balance_value", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def get_benchmark_ordering_sheet(item_codes):
+    supplier = get_benchmark_supplier()
+    sheet = frappe.db.get_value("Ordering Sheet", {"supplier": supplier, "docstatus": 0}, "name")
+    if sheet:
+        return sheet
+
+    return frappe.get_doc({
+        "doctype": "Ordering Sheet",
+        "supplier": supplier,
+        "daily_average_consumptiondays": 90,
+        "ordering_quantity": 14,
+        "order_quantity": [{"item": item_code, "tima_1": 10, "jangwani": 5} for item_code in item_codes[:20]]
+    }).insert(ignore_permissions=True, ignore_mandatory=True).name
+
+
+def get_cases():
+    """{name: (callable, setup or None, teardown or None)} for every benchmarked endpoint
+
+    A teardown gets the call's return value and undoes what the call wrote.
+    """
+    from upande_timaflor.upande_timaflor.doctype.chemical_order_sheet.chemical_order_sheet import (
+        get_stock_for_all_chemicals
+    )
+    from upande_timaflor.upande_timaflor.doctype.fertilizer_order_sheet.fertilizer_order_sheet import (
+        calculate_historical_consumption,
+        get_warehouse_specific_stock
+    )
+    from upande_timaflor.upande_timaflor.doctype.ordering_sheet.ordering_sheet import get_all_consumption_data
+    from upande_timaflor.upande_timaflor.report.supplier_quotation_comparison_view import (
+        supplier_quotation_comparison_view
+    )
+
+    item_codes = frappe.get_all("Item", filters={"name": ("like", f"{PREFIX}%")}, pluck="name")
+    to_date = nowdate()
+    sheet = get_benchmark_ordering_sheet(item_codes)
+
+    cases = {
+        "get_all_consumption_data": (
+            lambda: get_all_consumption_data(item_codes, add_days(to_date, -90), to_date), None, None
+        ),
+        "calculate_historical_consumption": (lambda: calculate_historical_consumption(12), None, None),
+        "get_warehouse_specific_stock": (get_warehouse_specific_stock, None, None),
+        "get_stock_for_all_chemicals": (get_stock_for_all_chemicals, None, None),
+        "create_purchase_order": (
+            lambda: frappe.get_doc("Ordering Sheet", sheet).create_purchase_order(),
+            None,
+            # The PO is submitted and committed; without this every run adds ordered qty
+            delete_purchase_order
+        ),
+        "report:Supplier Quotation Comparison View": (
+            lambda: supplier_quotation_comparison_view.execute({"rfq": BENCHMARK_RFQ}),
+            # Time the query path, not the cached result
+            lambda: frappe.cache().delete_keys("upande_timaflor:sq_comparison:"),
+            None
+        )
+    }
+
+    stock_ledger_report = load_stock_ledger_report()
+    if stock_ledger_report:
+        cases["report:Stock Ledger No Balance Value"] = (
+            lambda: stock_ledger_report.execute({"from_date": add_days(to_date, -30), "to_date": to_date}),
+            None,
+            None
+        )
+    return cases
+
+
+def delete_purchase_order(name):
+    po = frappe.get_doc("Purchase Order", name)
+    if po.docstatus == 1:
+        po.flags.ignore_permissions = True
+        po.cancel()
+    frappe.delete_doc("Purchase Order", name, force=1, ignore_permissions=True)
+    frappe.db.commit()
+
+
+def time_case(call, setup, teardown, iterations):
+    """Latency (ms) and query count per call, after one warm-up call"""
+    latencies, queries = [], []
+    for i in range(iterations + 1):
+        if setup:
+            setup()
+        with count_queries() as counter:
+            start = time.perf_counter()
+            result = call()
+            elapsed = (time.perf_counter() - start) * 1000
+        if teardown:
+            teardown(result)
+        if i:
+            latencies.append(elapsed)
+            queries.append(counter["queries"])
+
+    ordered = sorted(latencies)
+    return {
+        "iterations": iterations,
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p95_ms": round(percentile(ordered, 95), 2),
+        "max_ms": round(ordered[-1], 2),
+        "queries": max(queries)
+    }
+
+
+def get_volumes():
+    like = {"name": ("like", f"{PREFIX}%")}
+    return {
+        "items": frappe.db.count("Item", like),
+        "warehouses": frappe.db.count("Warehouse", like),
+        "sle_rows": frappe.db.count("Stock Ledger Entry", like),
+        "bins": frappe.db.count("Bin", like)
+    }
+
+
+def run_benchmark(iterations=DEFAULT_ITERATIONS, output=None, baseline=None, tolerance=REGRESSION_TOLERANCE):
+    """Run every case, write the results to `output` and compare them with `baseline`,
+    the output of an earlier run on the same site
+
+    Returns the report; its "regressions" list names cases whose p95 grew by more
+    than `tolerance` or that now issue more queries than the baseline.
+    """
+    results = {}
+    for name, (call, setup, teardown) in get_cases().items():
+        try:
+            results[name] = time_case(call, setup, teardown, iterations)
+        except Exception as e:
+            frappe.db.rollback()
+            results[name] = {"error": str(e)}
+
+    report = {
+        "generated_at": now(),
+        "site": frappe.local.site,
+        "volumes": get_volumes(),
+        "results": results,
+        "regressions": []
+    }
+
+    if baseline and os.path.exists(baseline):
+        with open(baseline) as f:
+            report["regressions"] = compare_with_baseline(results, json.load(f).get("results", {}), tolerance)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=1, sort_keys=True)
+
+    return report
+
+
+def compare_with_baseline(results, baseline_results, tolerance=REGRESSION_TOLERANCE):
+    regressions = []
+    for name, result in results.items():
+        base = baseline_results.get(name)
+        if not base or "error" in base:
+            continue
+        if "error" in result:
+            regressions.append({"case": name, "reason": "error", "detail": result["error"]})
+            continue
+        if result["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append({"case": name, "reason": "latency", "baseline": base["p95_ms"], "current": result["p95_ms"]})
+        if result["queries"] > base["queries"]:
+            regressions.append({"case": name, "reason": "queries", "baseline": base["queries"], "current": result["queries"]})
+    return regressions
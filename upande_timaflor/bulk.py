@@ -0,0 +1,75 @@
+import frappe
+from frappe.model import no_value_fields
+from frappe.utils import cint, flt, now
+
+# Columns created NOT NULL DEFAULT 0; an explicit NULL would fail the INSERT
+NUMERIC_FIELDTYPES = {"Int": cint, "Check": cint, "Float": flt, "Currency": flt, "Percent": flt}
+
+
+def get_child_doctype(parent_doc, parentfield):
+    return parent_doc.meta.get_field(parentfield).options
+
+
+def insert_child_rows(parent_doc, parentfield, rows, start_idx=None):
+    """Append rows to a saved document's child table with one multi-row INSERT
+
+    Rows are written directly, without child document hooks or validation, and
+    inherit the parent's docstatus so submitted documents stay consistent.
+    """
+    if not rows:
+        return []
+
+    child_doctype = get_child_doctype(parent_doc, parentfield)
+    fields = [df for df in frappe.get_meta(child_doctype).fields if df.fieldtype not in no_value_fields]
+
+    if start_idx is None:
+        start_idx = get_max_idx(parent_doc, parentfield) + 1
+
+    timestamp = now()
+    user = frappe.session.user
+    names = []
+    values = []
+    for i, row in enumerate(rows):
+        name = frappe.generate_hash(length=10)
+        names.append(name)
+        values.append((
+            name, timestamp, timestamp, user, user, parent_doc.docstatus, start_idx + i,
+            parent_doc.name, parent_doc.doctype, parentfield,
+            *[get_column_value(row, df) for df in fields]
+        ))
+
+    columns = [
+        "name", "creation", "modified", "modified_by", "owner", "docstatus", "idx",
+        "parent", "parenttype", "parentfield", *[df.fieldname for df in fields]
+    ]
+    frappe.db.bulk_insert(child_doctype, columns, values)
+    return names
+
+
+def get_column_value(row, df):
+    """The row's value, or the field default (0 for numeric fields) as Document.get_valid_dict sets it"""
+    value = row.get(df.fieldname)
+    if value is None:
+        value = df.default
+    if df.fieldtype in NUMERIC_FIELDTYPES:
+        return NUMERIC_FIELDTYPES[df.fieldtype](value)
+    return value
+
+
+def replace_child_rows(parent_doc, parentfield, rows):
+    """Swap a saved document's child table for new rows: one DELETE plus one multi-row INSERT"""
+    frappe.db.delete(get_child_doctype(parent_doc, parentfield), {
+        "parent": parent_doc.name,
+        "parenttype": parent_doc.doctype,
+        "parentfield": parentfield
+    })
+    return insert_child_rows(parent_doc, parentfield, rows, start_idx=1)
+
+
+def get_max_idx(parent_doc, parentfield):
+    max_idx = frappe.db.sql(f"""
+        SELECT MAX(idx)
+        FROM `tab{get_child_doctype(parent_doc, parentfield)}`
+        WHERE parent = %s AND parenttype = %s AND parentfield = %s
+    """, (parent_doc.name, parent_doc.doctype, parentfield))
+    return (max_idx and max_idx[0][0]) or 0
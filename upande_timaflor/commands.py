@@ -0,0 +1,120 @@
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-farm-consumption")
+@click.option("--from-date", help="Only rebuild days on or after this date (YYYY-MM-DD)")
+@click.option("--to-date", help="Only rebuild days on or before this date (YYYY-MM-DD)")
+@pass_context
+def rebuild_farm_consumption(context, from_date=None, to_date=None):
+    """Backfill the Farm Daily Consumption rollup from the Stock Ledger"""
+    import frappe
+    from upande_timaflor.upande_timaflor.doctype.farm_daily_consumption.farm_daily_consumption import (
+        rebuild_farm_daily_consumption
+    )
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        rows = rebuild_farm_daily_consumption(from_date=from_date, to_date=to_date)
+        click.echo(f"Farm Daily Consumption rebuilt: {rows} rows")
+    finally:
+        frappe.destroy()
+
+
+@click.command("check-consumption-indexes")
+@pass_context
+def check_consumption_indexes(context):
+    """EXPLAIN the queries the consumption indexes serve and report whether they are used"""
+    import frappe
+    from upande_timaflor.indexes import explain_consumption_queries
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        report = explain_consumption_queries()
+        for row in report:
+            status = "ok" if row["uses_index"] else "NOT USED"
+            click.echo(f"{row['query']}: {row['table']} key={row['key']} ({row['access']}) "
+                       f"expected={row['expected']} [{status}]")
+        if not all(row["uses_index"] for row in report):
+            raise SystemExit(1)
+    finally:
+        frappe.destroy()
+
+
+@click.command("seed-benchmark-data")
+@click.option("--items", default=200, help="Number of Items (split between Fertilizer and Chemical)")
+@click.option("--sle-rows", default=100000, help="Number of Stock Ledger Entries")
+@click.option("--days", default=365, help="Days of ledger history")
+@click.option("--suppliers", default=10, help="Number of quoting suppliers")
+@pass_context
+def seed_benchmark_data(context, items, sle_rows, days, suppliers):
+    """Seed synthetic Items, farm Warehouses and Stock Ledger Entries on a test site"""
+    import frappe
+    from upande_timaflor.benchmarks.generator import seed_benchmark_data
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        volumes = seed_benchmark_data(items=items, sle_rows=sle_rows, days=days, suppliers=suppliers)
+        click.echo(f"Seeded: {volumes}")
+    finally:
+        frappe.destroy()
+
+
+@click.command("run-benchmark")
+@click.option("--iterations", default=5, help="Timed calls per endpoint, after one warm-up call")
+@click.option("--output", help="Write the results as JSON to this path")
+@click.option("--baseline", help="Compare with an earlier --output of this site and fail on regressions")
+@click.option("--tolerance", default=0.2, help="Allowed p95 growth over the baseline (0.2 = 20%)")
+@pass_context
+def run_benchmark(context, iterations, output=None, baseline=None, tolerance=0.2):
+    """Time the ordering endpoints and reports on seeded data"""
+    import frappe
+    from upande_timaflor.benchmarks.runner import run_benchmark
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        report = run_benchmark(iterations=iterations, output=output, baseline=baseline, tolerance=tolerance)
+        for name, result in report["results"].items():
+            if "error" in result:
+                click.echo(f"{name}: ERROR {result['error']}")
+            else:
+                click.echo(f"{name}: p50={result['p50_ms']}ms p95={result['p95_ms']}ms queries={result['queries']}")
+        for regression in report["regressions"]:
+            click.echo(f"REGRESSION {regression}")
+        if report["regressions"]:
+            raise SystemExit(1)
+    finally:
+        frappe.destroy()
+
+
+@click.command("clear-benchmark-data")
+@pass_context
+def clear_benchmark_data(context):
+    """Remove the synthetic benchmark data"""
+    import frappe
+    from upande_timaflor.benchmarks.generator import clear_benchmark_data
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        clear_benchmark_data()
+    finally:
+        frappe.destroy()
+
+
+commands = [
+    rebuild_farm_consumption,
+    check_consumption_indexes,
+    seed_benchmark_data,
+    run_benchmark,
+    clear_benchmark_data
+]
@@ -0,0 +1,207 @@
+import math
+from datetime import timedelta
+from statistics import NormalDist
+
+PERCENTILES = (50, 90, 95)
+
+
+class DailySeriesStats:
+    """Running statistics for one (item, farm) daily series over a fixed window
+
+    Days are added as they are read; days that never appear count as zero, so
+    averages and percentiles describe the whole window rather than active days.
+    """
+
+    __slots__ = ("window_days", "values", "total", "sum_sq", "min", "max")
+
+    def __init__(self, window_days):
+        self.window_days = window_days
+        self.values = []
+        self.total = 0.0
+        self.sum_sq = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, qty):
+        qty = float(qty or 0)
+        self.values.append(qty)
+        self.total += qty
+        self.sum_sq += qty * qty
+        self.min = qty if self.min is None else min(self.min, qty)
+        self.max = qty if self.max is None else max(self.max, qty)
+
+    @property
+    def zero_days(self):
+        return max(self.window_days - len(self.values), 0)
+
+    def summary(self):
+        days = max(self.window_days, len(self.values))
+        if not days:
+            return empty_summary()
+
+        minimum, maximum = self.min, self.max
+        if self.zero_days:
+            minimum = 0.0 if minimum is None else min(minimum, 0.0)
+            maximum = 0.0 if maximum is None else max(maximum, 0.0)
+
+        average = self.total / days
+        variance = max(self.sum_sq / days - average * average, 0.0)
+
+        ordered = sorted(self.values + [0.0] * self.zero_days)
+        summary = {
+            "average": average,
+            "minimum": minimum,
+            "maximum": maximum,
+            "total": self.total,
+            "std_dev": math.sqrt(variance),
+            "active_days": len(self.values)
+        }
+        for p in PERCENTILES:
+            summary[f"p{p}"] = percentile(ordered, p)
+        return summary
+
+
+def percentile(ordered, p):
+    """Linear-interpolated percentile of an already sorted list"""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * p / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def empty_summary():
+    summary = {"average": 0, "minimum": 0, "maximum": 0, "total": 0, "std_dev": 0, "active_days": 0}
+    summary.update({f"p{p}": 0 for p in PERCENTILES})
+    return summary
+
+
+ROLLING_WINDOWS = (4, 8, 12, 26)
+SEASONAL_HISTORY_WEEKS = 104
+
+
+def mean(values):
+    return sum(values) / len(values) if values else 0.0
+
+
+def linear_slope(values):
+    """Least-squares slope of evenly spaced values (change per step)"""
+    n = len(values)
+    if n < 2:
+        return 0.0
+    mean_x = (n - 1) / 2
+    mean_y = mean(values)
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(values))
+    denominator = sum((x - mean_x) ** 2 for x in range(n))
+    return numerator / denominator
+
+
+def seasonal_indices(weekly):
+    """{iso_week: mean for that week / overall mean} from (iso_week, qty) pairs, oldest first
+
+    History starts at the first week with consumption, so zero-filled weeks
+    before an item was used do not count. Needs at least a year of that
+    history; otherwise no seasonal adjustment applies.
+    """
+    first_used = next((i for i, (_week, qty) in enumerate(weekly) if qty), len(weekly))
+    weekly = weekly[first_used:]
+    if len(weekly) < 52:
+        return {}
+    overall = mean([qty for _week, qty in weekly])
+    if not overall:
+        return {}
+
+    by_week = {}
+    for iso_week, qty in weekly:
+        by_week.setdefault(iso_week, []).append(qty)
+    return {iso_week: mean(qtys) / overall for iso_week, qtys in by_week.items()}
+
+
+def summarize_weekly_series(series, weeks):
+    """Summary of a zero-filled weekly series [(week_start, iso_week, qty)], oldest first
+
+    `average` and `trend` cover the last `weeks` weeks. `seasonal_average` is the
+    deseasonalised mean of that window scaled to the coming week's seasonal index.
+    """
+    qtys = [float(qty or 0) for _start, _week, qty in series]
+    window = qtys[-weeks:] if weeks else []
+
+    summary = {f"mean_{n}w": mean(qtys[-n:]) for n in ROLLING_WINDOWS}
+    summary["average"] = mean(window)
+    summary["trend"] = linear_slope(window)
+
+    indices = seasonal_indices([(iso_week, float(qty or 0)) for _start, iso_week, qty in series])
+    seasonal_average = summary["average"]
+    next_index = None
+    if series:
+        next_week = (series[-1][0] + timedelta(days=7)).isocalendar()[1]
+        next_index = indices.get(next_week)
+    # A missing or zero index for the coming week says nothing about demand; leave the average as is
+    if next_index and window:
+        recent = series[-len(window):]
+        deseasonalised = [
+            qty / indices[iso_week] if indices.get(iso_week) else qty
+            for (_start, iso_week, _qty), qty in zip(recent, window)
+        ]
+        seasonal_average = mean(deseasonalised) * next_index
+    summary["seasonal_average"] = seasonal_average
+
+    return summary
+
+
+# Holt linear smoothing: alpha smooths the level, beta the trend (beta 0 is simple
+# exponential smoothing). Parameters are picked per series from this grid by
+# one-step-ahead squared error.
+LEVEL_GRID = (0.1, 0.2, 0.3, 0.5, 0.7)
+TREND_GRID = (0.0, 0.05, 0.1, 0.2)
+DEFAULT_SERVICE_LEVEL = 0.95
+
+
+def fit_holt(values, alpha, beta):
+    """Run Holt smoothing over a series; returns (level, trend, sum of squared one-step errors)"""
+    level, trend, sse = values[0], 0.0, 0.0
+    for actual in values[1:]:
+        error = actual - (level + trend)
+        sse += error * error
+        new_level = alpha * actual + (1 - alpha) * (level + trend)
+        trend = beta * (new_level - level) + (1 - beta) * trend
+        level = new_level
+    return level, trend, sse
+
+
+def forecast_demand(values, horizon, service_level=DEFAULT_SERVICE_LEVEL):
+    """Forecast total demand over the next `horizon` steps, with safety stock from forecast error
+
+    Safety stock is z * RMSE * sqrt(horizon), treating one-step errors as
+    independent across the horizon.
+    """
+    values = [float(v or 0) for v in values]
+    result = {"demand": 0.0, "safety_stock": 0.0, "rmse": 0.0, "alpha": None, "beta": None}
+    if not values or horizon <= 0:
+        return result
+
+    if len(values) < 3:
+        result["demand"] = mean(values) * horizon
+        return result
+
+    best = None
+    for alpha in LEVEL_GRID:
+        for beta in TREND_GRID:
+            level, trend, sse = fit_holt(values, alpha, beta)
+            if best is None or sse < best[2]:
+                best = (level, trend, sse, alpha, beta)
+
+    level, trend, sse, alpha, beta = best
+    rmse = math.sqrt(sse / (len(values) - 1))
+    z = NormalDist().inv_cdf(service_level)
+    result.update({
+        "demand": sum(max(level + trend * step, 0.0) for step in range(1, horizon + 1)),
+        "safety_stock": max(z, 0.0) * rmse * math.sqrt(horizon),
+        "rmse": rmse,
+        "alpha": alpha,
+        "beta": beta
+    })
+    return result
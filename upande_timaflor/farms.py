@@ -0,0 +1,135 @@
+import re
+
+import frappe
+from frappe.utils import flt
+
+FARM_REGISTRY_CACHE_KEY = "upande_timaflor:farm_registry"
+GREENHOUSE_CACHE_KEY = "upande_timaflor:greenhouses"
+
+
+def get_farm_fieldname(farm):
+    """Child table column used for a farm: Tima1 -> tima_1, Jangwani -> jangwani"""
+    return re.sub(r"(?<=[a-z])(?=\d)", "_", frappe.scrub(farm))
+
+
+def get_farm_registry():
+    """Farms in use (from Warehouse.farm and Greenhouse.farm), with their column and warehouses
+
+    Returns {farm: {"farm", "fieldname", "warehouses", "stores"}} in natural farm
+    order (Tima1, Tima2, ... Tima10), where "stores" is {item group: warehouses}
+    from each Warehouse's Farm Store For setting. Cached until a Warehouse or
+    Greenhouse changes.
+    """
+    cache = frappe.cache()
+    registry = cache.get_value(FARM_REGISTRY_CACHE_KEY)
+    if registry is not None:
+        return registry
+
+    warehouses = frappe.db.sql("""
+        SELECT name, farm
+        FROM `tabWarehouse`
+        WHERE IFNULL(farm, '') != '' AND disabled = 0
+        ORDER BY name
+    """, as_dict=1)
+    store_groups = {}
+    for warehouse, item_group in frappe.db.sql("""
+        SELECT parent, item_group
+        FROM `tabFarm Store Item Group`
+        WHERE parenttype = 'Warehouse' AND parentfield = 'farm_store_item_groups'
+    """):
+        store_groups.setdefault(warehouse, []).append(item_group)
+    greenhouse_farms = frappe.db.sql_list("""
+        SELECT DISTINCT farm FROM `tabGreenhouse` WHERE IFNULL(farm, '') != ''
+    """)
+
+    farms = {row.farm for row in warehouses} | set(greenhouse_farms)
+    registry = {}
+    for farm in sorted(farms, key=natural_key):
+        farm_warehouses = [row.name for row in warehouses if row.farm == farm]
+        stores = {}
+        for warehouse in farm_warehouses:
+            for item_group in store_groups.get(warehouse, []):
+                stores.setdefault(item_group, []).append(warehouse)
+        registry[farm] = {
+            "farm": farm,
+            "fieldname": get_farm_fieldname(farm),
+            "warehouses": farm_warehouses,
+            "stores": stores
+        }
+
+    cache.set_value(FARM_REGISTRY_CACHE_KEY, registry)
+    return registry
+
+
+def natural_key(value):
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", value)]
+
+
+def get_farms():
+    return list(get_farm_registry())
+
+
+def get_farm_fields():
+    return [farm["fieldname"] for farm in get_farm_registry().values()]
+
+
+@frappe.whitelist()
+def get_farm_columns():
+    """[{"farm", "fieldname"}] in farm order, for forms that build per-farm columns"""
+    return [{"farm": farm["farm"], "fieldname": farm["fieldname"]} for farm in get_farm_registry().values()]
+
+
+def boot_session(bootinfo):
+    bootinfo.farm_columns = get_farm_columns()
+
+
+def get_farm_total(row):
+    """Sum of a row's per-farm quantity columns"""
+    return sum(flt(row.get(field)) for field in get_farm_fields())
+
+
+def get_farm_warehouse_map(item_group=None):
+    """{warehouse: farm fieldname} with one store set per farm
+
+    When an item group is given, only the warehouses marked as the farm's store
+    for it (Warehouse "Farm Store For") count; a farm without one has no stock
+    for the group. Without an item group, all of a farm's warehouses count.
+    """
+    warehouse_map = {}
+    for farm in get_farm_registry().values():
+        warehouses = farm["stores"].get(item_group, []) if item_group else farm["warehouses"]
+        for warehouse in warehouses:
+            warehouse_map[warehouse] = farm["fieldname"]
+    return warehouse_map
+
+
+def get_greenhouses():
+    """{greenhouse: {"farm", "area", "variety"}} for every Greenhouse, cached like the farm registry"""
+    cache = frappe.cache()
+    greenhouses = cache.get_value(GREENHOUSE_CACHE_KEY)
+    if greenhouses is not None:
+        return greenhouses
+
+    greenhouses = {
+        row.name: {"farm": row.farm, "area": flt(row.area), "variety": row.variety}
+        for row in frappe.get_all("Greenhouse", fields=["name", "farm", "area", "variety"])
+    }
+    cache.set_value(GREENHOUSE_CACHE_KEY, greenhouses)
+    return greenhouses
+
+
+def get_farm_areas(variety=None):
+    """{farm fieldname: total greenhouse area} for every farm, from the cached Greenhouse lookup"""
+    areas = dict.fromkeys(get_farm_fields(), 0.0)
+    for greenhouse in get_greenhouses().values():
+        if variety and greenhouse["variety"] != variety:
+            continue
+        if greenhouse["farm"]:
+            fieldname = get_farm_fieldname(greenhouse["farm"])
+            areas[fieldname] = areas.get(fieldname, 0.0) + greenhouse["area"]
+    return areas
+
+
+def clear_farm_registry(doc=None, method=None):
+    """Warehouse / Greenhouse hook"""
+    frappe.cache().delete_value([FARM_REGISTRY_CACHE_KEY, GREENHOUSE_CACHE_KEY])
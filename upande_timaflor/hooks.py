@@ -85,6 +85,9 @@ doctype_js = {
     "Material Request": "public/js/material_request.js"
 }
 
+# Farm columns for the order sheet forms (frappe.boot.farm_columns)
+boot_session = "upande_timaflor.farms.boot_session"
+
 # Fixtures
 # --------
 fixtures = [
@@ -197,6 +200,12 @@ fixtures = [
 
 # Scheduled Tasks
 # ---------------
+scheduler_events = {
+    "hourly_long": [
+        "upande_timaflor.upande_timaflor.doctype.farm_weekly_consumption.farm_weekly_consumption.refresh_changed_weeks"
+    ]
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"upande_timaflor.tasks.all"
@@ -290,5 +299,24 @@ fixtures = [
 doc_events = {
     "BOM": {
         "validate": ["upande_timaflor.utils.validate_bom"]
+    },
+    "Greenhouse": {
+        "on_update": "upande_timaflor.farms.clear_farm_registry",
+        "on_trash": "upande_timaflor.farms.clear_farm_registry"
+    },
+    "Warehouse": {
+        "on_update": "upande_timaflor.farms.clear_farm_registry",
+        "on_trash": "upande_timaflor.farms.clear_farm_registry"
+    },
+    "Item": {
+        "on_update": "upande_timaflor.items.clear_item_details_cache",
+        "on_trash": "upande_timaflor.items.clear_item_details_cache"
+    },
+    "Employee": {
+        "on_update": "upande_timaflor.upande_timaflor.doctype.biometric_log.biometric_log.clear_biometric_employee_map",
+        "on_trash": "upande_timaflor.upande_timaflor.doctype.biometric_log.biometric_log.clear_biometric_employee_map"
+    },
+    "Stock Ledger Entry": {
+        "on_submit": "upande_timaflor.upande_timaflor.doctype.farm_daily_consumption.farm_daily_consumption.update_consumption_rollup"
     }
 }
\ No newline at end of file
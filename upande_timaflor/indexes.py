@@ -0,0 +1,76 @@
+import frappe
+from frappe.utils import add_days, nowdate
+
+# (doctype, columns, index name) - the SLE index is kept for the Farm Daily
+# Consumption rebuild (backfill): it reads only these columns over a posting
+# date range with no item filter, so posting_date leads and the rebuild
+# range-scans the index instead of the table rows. The live consumption
+# queries read the rollup, and the Stock Ledger report sorts by posting time
+# on ERPNext's own indexes.
+CONSUMPTION_INDEXES = (
+    ("Stock Ledger Entry",
+     ["posting_date", "item_code", "warehouse", "is_cancelled", "actual_qty"],
+     "posting_consumption_index"),
+    ("Warehouse", ["farm"], "farm_index")
+)
+
+
+def add_consumption_indexes():
+    """Create the consumption covering indexes that are missing"""
+    for doctype, columns, index_name in CONSUMPTION_INDEXES:
+        frappe.db.add_index(doctype, columns, index_name=index_name)
+
+
+def explain_consumption_queries(days=90):
+    """EXPLAIN the queries the indexes serve and report which index the planner picks
+
+    Returns a list of {"query", "table", "expected", "key", "access", "uses_index"}.
+    """
+    params = {
+        "from_date": add_days(nowdate(), -days),
+        "to_date": nowdate(),
+        "farm": frappe.db.get_value("Warehouse", {"farm": ("is", "set")}, "farm") or ""
+    }
+    queries = {
+        # The SELECT of rebuild_farm_daily_consumption for a date range
+        "Farm Daily Consumption rebuild": ("""
+            SELECT
+                sle.item_code,
+                IFNULL(w.farm, ''),
+                sle.posting_date,
+                SUM(sle.actual_qty),
+                SUM(CASE WHEN sle.is_cancelled = 0 AND sle.actual_qty < 0 THEN sle.actual_qty ELSE 0 END)
+            FROM `tabStock Ledger Entry` sle
+            LEFT JOIN `tabWarehouse` w ON sle.warehouse = w.name
+            WHERE sle.posting_date >= %(from_date)s AND sle.posting_date <= %(to_date)s
+            GROUP BY sle.item_code, IFNULL(w.farm, ''), sle.posting_date
+        """, {"sle": "posting_consumption_index"}),
+        # The per-farm filter of stock.get_stock_snapshot
+        "Farm warehouses": ("""
+            SELECT name FROM `tabWarehouse` WHERE farm = %(farm)s
+        """, {"tabWarehouse": "farm_index"})
+    }
+
+    report = []
+    for label, (query, expected_keys) in queries.items():
+        for row in frappe.db.sql(f"EXPLAIN {query}", params, as_dict=True):
+            expected = expected_keys.get(row.table)
+            if not expected:
+                continue
+            report.append({
+                "query": label,
+                "table": row.table,
+                "expected": expected,
+                "key": row.key,
+                "access": row.type,
+                "uses_index": row.key == expected
+            })
+    return report
+
+
+@frappe.whitelist()
+def check_consumption_indexes():
+    """Confirm the planner uses the consumption covering indexes"""
+    frappe.only_for("System Manager")
+    report = explain_consumption_queries()
+    return {"ok": all(row["uses_index"] for row in report), "plans": report}
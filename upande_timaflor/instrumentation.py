@@ -0,0 +1,142 @@
+import functools
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint, now
+
+from upande_timaflor.consumption import percentile
+
+# Samples live in a capped Redis list: newest first, oldest trimmed on every write
+SAMPLES_CACHE_KEY = "upande_timaflor:endpoint_samples"
+DEFAULT_SAMPLE_SIZE = 2000
+SLOWEST_CALLS = 20
+
+
+@contextmanager
+def count_queries():
+    """Count frappe.db.sql calls made inside the block and the rows they returned"""
+    counter = {"queries": 0, "rows": 0}
+    sql = frappe.db.sql
+
+    def counted_sql(*args, **kwargs):
+        result = sql(*args, **kwargs)
+        counter["queries"] += 1
+        if isinstance(result, (list, tuple)):
+            counter["rows"] += len(result)
+        return result
+
+    frappe.db.sql = counted_sql
+    try:
+        yield counter
+    finally:
+        frappe.db.sql = sql
+
+
+def get_endpoint_name(fn):
+    # ordering_sheet.OrderingSheet.create_purchase_order, fertilizer_order_sheet.get_all_fertilizers
+    return f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__qualname__}"
+
+
+def get_sample_size():
+    return cint(frappe.conf.get("endpoint_sample_size")) or DEFAULT_SAMPLE_SIZE
+
+
+def instrumented(fn):
+    """Record wall time, query count, rows fetched and payload size of every call
+
+    Place it below @frappe.whitelist() so the whitelisted callable is the wrapper;
+    functools.wraps keeps the signature Frappe reads to map request arguments.
+    """
+    endpoint = get_endpoint_name(fn)
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        result = error = None
+        with count_queries() as counter:
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                error = type(e).__name__
+                raise
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                record_sample(endpoint, elapsed, counter, result, error)
+        return result
+
+    return wrapper
+
+
+def get_payload_size(result):
+    if result is None:
+        return 0
+    try:
+        return len(frappe.as_json(result, indent=None))
+    except TypeError:
+        return 0
+
+
+def record_sample(endpoint, elapsed, counter, result, error):
+    """Store one call's sample; a failure here is logged and never reaches the caller"""
+    try:
+        sample = {
+            "endpoint": endpoint,
+            "ms": round(elapsed, 2),
+            "queries": counter["queries"],
+            "rows": counter["rows"],
+            "payload_bytes": get_payload_size(result) if error is None else 0,
+            "user": frappe.session.user if getattr(frappe.local, "session", None) else None,
+            "at": now(),
+            "error": error
+        }
+        cache = frappe.cache()
+        cache.lpush(SAMPLES_CACHE_KEY, frappe.as_json(sample, indent=None))
+        cache.ltrim(SAMPLES_CACHE_KEY, 0, get_sample_size() - 1)
+    except Exception:
+        frappe.log_error(f"Endpoint instrumentation error ({endpoint}): {frappe.get_traceback()}")
+
+
+def get_samples():
+    return [frappe.parse_json(sample) for sample in frappe.cache().lrange(SAMPLES_CACHE_KEY, 0, -1)]
+
+
+@frappe.whitelist()
+def get_endpoint_stats(slowest=SLOWEST_CALLS):
+    """p50/p95 latency per endpoint and the slowest recent calls"""
+    frappe.only_for("System Manager")
+
+    samples = get_samples()
+    by_endpoint = {}
+    for sample in samples:
+        by_endpoint.setdefault(sample["endpoint"], []).append(sample)
+
+    endpoints = []
+    for endpoint, calls in by_endpoint.items():
+        latencies = sorted(call["ms"] for call in calls)
+        count = len(calls)
+        endpoints.append({
+            "endpoint": endpoint,
+            "calls": count,
+            "errors": sum(1 for call in calls if call.get("error")),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "max_ms": latencies[-1],
+            "avg_queries": round(sum(call["queries"] for call in calls) / count, 1),
+            "avg_rows": round(sum(call["rows"] for call in calls) / count, 1),
+            "avg_payload_bytes": round(sum(call["payload_bytes"] for call in calls) / count)
+        })
+    endpoints.sort(key=lambda row: row["p95_ms"], reverse=True)
+
+    return {
+        "sample_count": len(samples),
+        "sample_size": get_sample_size(),
+        "endpoints": endpoints,
+        "slowest": sorted(samples, key=lambda call: call["ms"], reverse=True)[:cint(slowest)]
+    }
+
+
+@frappe.whitelist(methods=["POST"])
+def clear_endpoint_samples():
+    frappe.only_for("System Manager")
+    frappe.cache().delete_value(SAMPLES_CACHE_KEY)
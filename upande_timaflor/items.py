@@ -0,0 +1,99 @@
+import frappe
+from frappe.utils.caching import request_cache
+
+# Cached item details live for a few hours at most; Item saves evict them sooner
+ITEM_DETAILS_TTL = 6 * 60 * 60
+ITEM_DETAILS_CACHE_KEY = "upande_timaflor:item_details"
+ITEM_GROUP_CACHE_KEY = "upande_timaflor:item_group_details"
+
+# Application settings kept as custom fields on Item, by the name the order sheets expect
+AGRO_ITEM_FIELDS = {
+    "application_rate": "custom_application_rate_per_ha",
+    "required_sprays": "custom_advised_no_sprays",
+    "number_of_sprays": "custom_no_of_sprays"
+}
+
+
+def get_item_details_map(item_codes, fields=("item_name", "description", "stock_uom")):
+    """Item master fields for many items in a single query, keyed by item code"""
+    item_codes = list({code for code in item_codes or [] if code})
+    if not item_codes:
+        return {}
+
+    items = frappe.get_all("Item",
+        filters={"name": ["in", item_codes]},
+        fields=["name", *fields]
+    )
+    return {item.name: item for item in items}
+
+
+@request_cache
+def get_agro_item_fields():
+    """Select expressions for the application custom fields present on Item"""
+    meta = frappe.get_meta("Item")
+    return [f"`{df}` as {field}" for field, df in AGRO_ITEM_FIELDS.items() if meta.has_field(df)]
+
+
+def set_agro_defaults(item):
+    # Fallback for missing custom fields
+    for field in AGRO_ITEM_FIELDS:
+        if item.get(field) is None:
+            item[field] = 0
+    return item
+
+
+def get_agro_item_details(item_codes):
+    """Item name and application settings per item code, served from cache where possible"""
+    cache = frappe.cache()
+    details = {}
+    missing = []
+
+    for item_code in dict.fromkeys(item_codes or []):
+        cached = cache.get_value(f"{ITEM_DETAILS_CACHE_KEY}:{item_code}")
+        if cached is None:
+            missing.append(item_code)
+        else:
+            details[item_code] = cached
+
+    if missing:
+        items = frappe.get_all("Item",
+            filters={"name": ["in", missing]},
+            fields=["name", "item_name", *get_agro_item_fields()]
+        )
+        for item in items:
+            set_agro_defaults(item)
+            cache.set_value(f"{ITEM_DETAILS_CACHE_KEY}:{item.name}", item, expires_in_sec=ITEM_DETAILS_TTL)
+            details[item.name] = item
+
+    return details
+
+
+def get_agro_items(item_group):
+    """Enabled items of a group with their application settings, cached per group"""
+    cache = frappe.cache()
+    key = f"{ITEM_GROUP_CACHE_KEY}:{item_group}"
+    items = cache.get_value(key)
+
+    if items is None:
+        items = frappe.get_all("Item",
+            filters={"item_group": item_group, "disabled": 0},
+            fields=["name", "item_name", *get_agro_item_fields()]
+        )
+        for item in items:
+            set_agro_defaults(item)
+        cache.set_value(key, items, expires_in_sec=ITEM_DETAILS_TTL)
+
+    return items
+
+
+def clear_item_details_cache(doc, method=None):
+    """Item hook: evict the item and the group lists it belongs (or belonged) to"""
+    item_groups = {doc.item_group}
+    previous = doc.get_doc_before_save()
+    if previous:
+        item_groups.add(previous.item_group)
+
+    frappe.cache().delete_value(
+        [f"{ITEM_DETAILS_CACHE_KEY}:{doc.name}"]
+        + [f"{ITEM_GROUP_CACHE_KEY}:{group}" for group in item_groups if group]
+    )
@@ -0,0 +1,5 @@
+from upande_timaflor.indexes import add_consumption_indexes
+
+
+def execute():
+    add_consumption_indexes()
@@ -0,0 +1,7 @@
+from upande_timaflor.upande_timaflor.doctype.farm_daily_consumption.farm_daily_consumption import (
+    rebuild_farm_daily_consumption
+)
+
+
+def execute():
+    rebuild_farm_daily_consumption()
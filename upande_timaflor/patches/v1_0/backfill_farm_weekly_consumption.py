@@ -0,0 +1,7 @@
+from upande_timaflor.upande_timaflor.doctype.farm_weekly_consumption.farm_weekly_consumption import (
+    refresh_changed_weeks
+)
+
+
+def execute():
+    refresh_changed_weeks()
@@ -0,0 +1,17 @@
+import frappe
+
+
+# Runs before model sync, which adds the unique (biometric_id, timestamp) key:
+# keep the first log of each punch
+def execute():
+    if not frappe.db.table_exists("Biometric Log"):
+        return
+
+    frappe.db.sql("""
+        DELETE duplicate
+        FROM `tabBiometric Log` duplicate
+        INNER JOIN `tabBiometric Log` first
+            ON first.biometric_id = duplicate.biometric_id
+            AND first.timestamp = duplicate.timestamp
+            AND first.name < duplicate.name
+    """)
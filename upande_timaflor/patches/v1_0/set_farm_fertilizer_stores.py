@@ -0,0 +1,37 @@
+import frappe
+from frappe.modules.utils import sync_customizations
+
+# The per-farm stores the Fertilizer Order Sheet read before stores became a
+# Warehouse setting, with the farm each one was mapped to by name
+FERTILIZER_STORES = {
+    "Fertilizer Store -T1 - T": "Tima1",
+    "Fertilizer Store -T2 - T": "Tima2",
+    "Fertilizer Store -T3 - T": "Tima3",
+    "Fertilizer Store -T4 - T": "Tima4",
+    "Fertilizer Store -T5 - T": "Tima5",
+    "Fertilizer Store -T6 - T": "Tima6",
+    "Fertilizer Store -T7 - T": "Tima7",
+    "Jangwani Stores - TFL": "Jangwani"
+}
+
+
+def execute():
+    if not frappe.db.exists("Item Group", "Fertilizer"):
+        return
+
+    # Custom fields are synced after post_model_sync patches; Farm Store For is needed now
+    sync_customizations("upande_timaflor")
+
+    for warehouse, farm in FERTILIZER_STORES.items():
+        if not frappe.db.exists("Warehouse", warehouse):
+            continue
+        doc = frappe.get_doc("Warehouse", warehouse)
+        if not doc.farm:
+            # Only warehouses with a farm are in the farm registry
+            if not frappe.db.exists("Farm", farm):
+                frappe.throw(f"Warehouse {warehouse} has no farm and Farm {farm} does not exist")
+            doc.farm = farm
+        if not any(row.item_group == "Fertilizer" for row in doc.get("farm_store_item_groups") or []):
+            doc.append("farm_store_item_groups", {"item_group": "Fertilizer"})
+        doc.flags.ignore_permissions = True
+        doc.save()
@@ -107,8 +107,8 @@ frappe.ui.form.on("Material Request", {
         // Add the new Material Request button here
         if (frm.doc.docstatus === 0) {
             frm.add_custom_button(
-                __("Material Request (Transfer)"), // Custom button label
-                () => frm.events.get_items_from_material_request_transfer(frm), // New event handler
+                __("Material Request (Remaining Qty)"),
+                () => frm.events.get_remaining_items_from_material_requests(frm),
                 __("Get Items From")
             );
         }
@@ -260,6 +260,43 @@ frappe.ui.form.on("Material Request", {
     //     });
     // },
 
+    // Unordered quantities of one or many submitted Material Requests, merged per item and warehouse
+    get_remaining_items_from_material_requests: function (frm) {
+        new frappe.ui.form.MultiSelectDialog({
+            doctype: "Material Request",
+            target: frm,
+            setters: {
+                material_request_type: frm.doc.material_request_type || undefined,
+                schedule_date: undefined,
+            },
+            get_query_filters: {
+                docstatus: 1,
+                status: ["not in", ["Stopped", "Closed"]],
+                per_ordered: ["<", 99.99],
+                company: frm.doc.company,
+            },
+            action(selections) {
+                if (!selections.length) return;
+                this.dialog.hide();
+                frappe.call({
+                    method: "upande_timaflor.utils.make_material_request_from_remaining",
+                    args: {
+                        source_names: selections,
+                        target_doc: frm.doc,
+                    },
+                    freeze: true,
+                    callback: function (r) {
+                        if (r.message) {
+                            frappe.model.sync(r.message);
+                            frm.dirty();
+                            frm.refresh();
+                        }
+                    },
+                });
+            },
+        });
+    },
+
     get_item_data: function (frm, item, overwrite_warehouse = false) {
         if (item && !item.item_code) {
             return;
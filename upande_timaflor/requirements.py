@@ -0,0 +1,74 @@
+import math
+
+import frappe
+from frappe.utils import flt
+
+from upande_timaflor.farms import get_farm_fields
+from upande_timaflor.stock import get_available_matrix
+
+
+def get_purchase_constraints(item_codes):
+    """{item_code: (min_order_qty, pack_size)} in stock UOM from the Item master
+
+    The pack size is the conversion factor of the item's purchase UOM, so a
+    fertilizer bought in 25 kg bags is ordered in multiples of 25.
+    """
+    item_codes = list(dict.fromkeys(item_codes or []))
+    if not item_codes:
+        return {}
+
+    return {
+        row.item_code: (flt(row.min_order_qty), flt(row.pack_size) or 1.0)
+        for row in frappe.db.sql("""
+            SELECT
+                i.name AS item_code,
+                i.min_order_qty,
+                IFNULL(ucd.conversion_factor, 1) AS pack_size
+            FROM `tabItem` i
+            LEFT JOIN `tabUOM Conversion Detail` ucd
+                ON ucd.parent = i.name
+                AND ucd.parenttype = 'Item'
+                AND ucd.uom = i.purchase_uom
+            WHERE i.name IN %(item_codes)s
+        """, {"item_codes": item_codes}, as_dict=1)
+    }
+
+
+def round_order_qty(qty, min_order_qty=0, pack_size=1):
+    """Raise a positive order quantity to the minimum order qty, then up to whole packs"""
+    qty = flt(qty)
+    if qty <= 0:
+        return 0.0
+
+    qty = max(qty, flt(min_order_qty))
+    if flt(pack_size) > 1:
+        # Tolerate float noise so 50.0000001 kg is still two 25 kg bags
+        qty = math.ceil(qty / pack_size - 1e-9) * pack_size
+    return qty
+
+
+def get_net_requirements(gross_rows, warehouse_group=None):
+    """Order Quantity rows for the shortfall only: per-farm gross requirement less available stock
+
+    Available stock is on hand plus open purchase orders less reservations, per
+    farm store set. Each item's total shortfall is rounded to its minimum order
+    qty and pack size, and the rounding is spread over the farms pro rata.
+    """
+    farm_fields = get_farm_fields()
+    item_codes = [row["item"] for row in gross_rows]
+    available = get_available_matrix(item_codes, warehouse_group)
+    constraints = get_purchase_constraints(item_codes)
+
+    net_rows = []
+    for row in gross_rows:
+        stock = available.get(row["item"], {})
+        shortfall = {field: max(flt(row.get(field)) - flt(stock.get(field)), 0.0) for field in farm_fields}
+        total = sum(shortfall.values())
+        if total <= 0:
+            continue
+
+        min_order_qty, pack_size = constraints.get(row["item"], (0.0, 1.0))
+        scale = round_order_qty(total, min_order_qty, pack_size) / total
+        net_rows.append({"item": row["item"], **{field: qty * scale for field, qty in shortfall.items()}})
+
+    return net_rows
@@ -0,0 +1,87 @@
+import frappe
+from frappe import _
+from frappe.utils import flt
+
+from upande_timaflor.farms import get_greenhouses
+
+PER_HECTARE = "Per Hectare"
+# Items say "Per Volume"; older BOMs were saved with "Per 100L"
+PER_VOLUME = ("Per Volume", "Per 100L")
+VOLUME_UNIT = 100
+
+
+def get_volume_rate(item):
+    return flt(item.get("custom_application_rate_per_10002000l") or item.get("custom_application_volume_per_10002000l"))
+
+
+def plan_row(item, greenhouse_area):
+    """(quantity, errors) for one BOM row: rate x area per hectare, rate x water volume per 100L"""
+    rate_type = item.get("custom_application_rate_type")
+    errors = []
+
+    if rate_type == PER_HECTARE:
+        rate = flt(item.get("custom_application_rate_per_ha"))
+        area = flt(item.get("custom_area_to_spray")) or greenhouse_area
+        if rate <= 0:
+            errors.append(_("Application Rate (per ha) must be greater than 0"))
+        if area <= 0:
+            errors.append(_("Area to Spray required (set it or pick a Greenhouse with an area)"))
+        if flt(item.get("custom_volume")):
+            errors.append(_("Remove Water Volume for Per Hectare items"))
+        return rate * area, errors
+
+    if rate_type in PER_VOLUME:
+        rate = get_volume_rate(item)
+        volume = flt(item.get("custom_volume"))
+        if rate <= 0:
+            errors.append(_("Application Rate (per 100L) must be greater than 0"))
+        if volume <= 0:
+            errors.append(_("Water Volume required"))
+        if flt(item.get("custom_area_to_spray")):
+            errors.append(_("Remove Area to Spray for Per 100L items"))
+        return rate * volume / VOLUME_UNIT, errors
+
+    return None, errors
+
+
+def apply_spray_plan(doc):
+    """Validate every spray row of a BOM in one pass and store the derived quantities
+
+    All row errors are reported together. Rows without a greenhouse use the BOM's
+    greenhouse; greenhouse areas come from the cached Greenhouse lookup. The
+    quantity is written to custom_spray_quantity and to qty, so Material Requests
+    raised from the BOM carry it as is.
+    """
+    greenhouses = get_greenhouses()
+    default_greenhouse = doc.get("custom_greenhouse")
+    errors = []
+    qty_changed = False
+
+    for item in doc.items:
+        if not item.item_code:
+            continue
+
+        greenhouse = greenhouses.get(item.get("custom_greenhouse") or default_greenhouse) or {}
+        greenhouse_area = flt(greenhouse.get("area"))
+        if greenhouse_area and not flt(item.get("custom_greenhouse_area")):
+            item.custom_greenhouse_area = greenhouse_area
+
+        quantity, row_errors = plan_row(item, greenhouse_area)
+        errors.extend(_("Row {0} ({1}): {2}").format(item.idx, item.item_code, error) for error in row_errors)
+        if quantity is None or row_errors:
+            continue
+
+        item.custom_spray_quantity = flt(quantity, item.precision("qty"))
+        if item.custom_spray_quantity and item.custom_spray_quantity != flt(item.qty):
+            item.qty = item.custom_spray_quantity
+            qty_changed = True
+
+    if errors:
+        frappe.throw(errors, title=_("Invalid Spray Plan"), as_list=True)
+
+    # BOM.validate already derived stock qty, exploded items and cost from the
+    # old quantities; "Get Items from BOM" reads the exploded items
+    if qty_changed:
+        doc.update_stock_qty()
+        doc.update_exploded_items(save=False)
+        doc.calculate_cost()
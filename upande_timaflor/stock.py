@@ -0,0 +1,176 @@
+import json
+
+import frappe
+from frappe.utils import flt
+
+from upande_timaflor.farms import get_farm_fields, get_farm_warehouse_map
+
+
+@frappe.whitelist()
+def get_stock_snapshot(item_group, warehouses=None, farm=None):
+    """Bin quantities for every enabled item in a group, per item and per warehouse, in one query
+
+    Returns {item_code: {"item_name", "total", "warehouses": {warehouse: qty}}}
+    ordered by item name. Items without stock are included with a zero total.
+    """
+    if isinstance(warehouses, str):
+        warehouses = json.loads(warehouses)
+
+    bin_conditions = []
+    params = {"item_group": item_group}
+    if warehouses:
+        bin_conditions.append("AND b.warehouse IN %(warehouses)s")
+        params["warehouses"] = list(warehouses)
+    if farm:
+        bin_conditions.append("AND b.warehouse IN (SELECT name FROM `tabWarehouse` WHERE farm = %(farm)s)")
+        params["farm"] = farm
+
+    stock_data = frappe.db.sql("""
+        SELECT
+            i.name AS item_code,
+            i.item_name AS item_name,
+            b.warehouse AS warehouse,
+            SUM(b.actual_qty) AS qty
+        FROM `tabItem` i
+        LEFT JOIN `tabBin` b ON b.item_code = i.name {bin_conditions}
+        WHERE
+            i.item_group = %(item_group)s
+            AND i.disabled = 0
+        GROUP BY i.name, b.warehouse
+        ORDER BY i.item_name, i.name
+    """.format(bin_conditions=" ".join(bin_conditions)), params, as_dict=1)
+
+    snapshot = {}
+    for entry in stock_data:
+        item = snapshot.setdefault(entry.item_code, {
+            "item_name": entry.item_name or entry.item_code,
+            "total": 0.0,
+            "warehouses": {}
+        })
+        if entry.warehouse:
+            qty = flt(entry.qty)
+            item["warehouses"][entry.warehouse] = qty
+            item["total"] += qty
+
+    return snapshot
+
+
+@frappe.whitelist()
+def get_stock_matrix(item_group, warehouse_group=None):
+    """Finished per-farm stock rows for every enabled item in a group, pivoted in one query
+
+    Each row carries item / item_code / item_name, one column per farm (e.g.
+    tima_1, jangwani) and total_stock. Farm columns sum the farm's stores from
+    `get_farm_warehouse_map(warehouse_group)`, defaulting to the item group's
+    own stores.
+    """
+    warehouse_map = get_farm_warehouse_map(warehouse_group or item_group)
+    params = {"item_group": item_group, "warehouses": list(warehouse_map) or [""]}
+    farm_columns = get_farm_pivot_columns(warehouse_map, "b.actual_qty", params)
+
+    return frappe.db.sql("""
+        SELECT
+            i.name AS item,
+            i.name AS item_code,
+            IFNULL(NULLIF(i.item_name, ''), i.name) AS item_name,
+            {farm_columns},
+            ROUND(IFNULL(SUM(b.actual_qty), 0), 2) AS total_stock
+        FROM `tabItem` i
+        LEFT JOIN `tabBin` b ON b.item_code = i.name AND b.warehouse IN %(warehouses)s
+        WHERE
+            i.item_group = %(item_group)s
+            AND i.disabled = 0
+        GROUP BY i.name
+        ORDER BY i.item_name, i.name
+    """.format(farm_columns=",\n            ".join(farm_columns)), params, as_dict=1)
+
+
+# Stock that can still cover demand: on hand plus open purchase orders (Bin
+# ordered_qty), less quantities reserved against sales orders
+AVAILABLE_QTY = "(b.actual_qty + b.ordered_qty - b.reserved_qty)"
+
+
+def get_available_matrix(item_codes, warehouse_group=None):
+    """{item_code: {farm fieldname: available qty}} for the given items in one pivot query"""
+    item_codes = list(dict.fromkeys(item_codes or []))
+    if not item_codes:
+        return {}
+
+    warehouse_map = get_farm_warehouse_map(warehouse_group)
+    params = {"item_codes": item_codes, "warehouses": list(warehouse_map) or [""]}
+    farm_columns = get_farm_pivot_columns(warehouse_map, AVAILABLE_QTY, params)
+
+    rows = frappe.db.sql("""
+        SELECT
+            b.item_code,
+            {farm_columns}
+        FROM `tabBin` b
+        WHERE
+            b.item_code IN %(item_codes)s
+            AND b.warehouse IN %(warehouses)s
+        GROUP BY b.item_code
+    """.format(farm_columns=",\n            ".join(farm_columns)), params, as_dict=1)
+
+    return {row.pop("item_code"): row for row in rows}
+
+
+def get_farm_pivot_columns(warehouse_map, qty_expression, params):
+    """One `SUM(CASE ...) AS <farm fieldname>` column per farm, adding the farm's stores to params"""
+    farm_columns = []
+    for i, fieldname in enumerate(get_farm_fields()):
+        warehouses = [w for w, field in warehouse_map.items() if field == fieldname]
+        if warehouses:
+            params[f"farm_{i}"] = warehouses
+            farm_columns.append(
+                f"ROUND(SUM(CASE WHEN b.warehouse IN %(farm_{i})s THEN {qty_expression} ELSE 0 END), 2) AS `{fieldname}`"
+            )
+        else:
+            farm_columns.append(f"0 AS `{fieldname}`")
+    return farm_columns
+
+
+def get_valuation_rates(item_codes, warehouse_group=None):
+    """{item_code: {"rate", <farm fieldname>: rate}} valuing stock per farm, in two queries
+
+    A farm's rate is its stores' stock value over their quantity. Farms without
+    stock fall back to the item's rate across all warehouses, then to its last
+    purchase rate, then to Item.valuation_rate.
+    """
+    item_codes = list(dict.fromkeys(code for code in item_codes or [] if code))
+    if not item_codes:
+        return {}
+
+    warehouse_map = get_farm_warehouse_map(warehouse_group)
+    bins = frappe.db.sql("""
+        SELECT item_code, warehouse, stock_value, actual_qty
+        FROM `tabBin`
+        WHERE item_code IN %(item_codes)s AND actual_qty > 0
+    """, {"item_codes": item_codes}, as_dict=1)
+    fallback = frappe.db.sql("""
+        SELECT name, last_purchase_rate, valuation_rate
+        FROM `tabItem`
+        WHERE name IN %(item_codes)s
+    """, {"item_codes": item_codes}, as_dict=1)
+
+    # [stock value, qty] per item, overall and per farm column
+    totals = {code: {"rate": [0.0, 0.0]} for code in item_codes}
+    for entry in bins:
+        keys = ["rate"]
+        if entry.warehouse in warehouse_map:
+            keys.append(warehouse_map[entry.warehouse])
+        for key in keys:
+            value_qty = totals[entry.item_code].setdefault(key, [0.0, 0.0])
+            value_qty[0] += flt(entry.stock_value)
+            value_qty[1] += flt(entry.actual_qty)
+
+    fallback_rates = {row.name: flt(row.last_purchase_rate) or flt(row.valuation_rate) for row in fallback}
+    rates = {}
+    for item_code, item_totals in totals.items():
+        value, qty = item_totals["rate"]
+        item_rate = value / qty if qty else fallback_rates.get(item_code, 0.0)
+        rates[item_code] = {"rate": item_rate}
+        for fieldname in get_farm_fields():
+            value, qty = item_totals.get(fieldname, (0.0, 0.0))
+            rates[item_code][fieldname] = value / qty if qty else item_rate
+
+    return rates
@@ -0,0 +1,96 @@
+# Copyright (c) 2026, newton@upande.com and Contributors
+# See license.txt
+
+import unittest
+from datetime import date, timedelta
+
+from upande_timaflor.consumption import (
+	DailySeriesStats,
+	forecast_demand,
+	linear_slope,
+	percentile,
+	seasonal_indices,
+	summarize_weekly_series,
+)
+
+
+def weekly_series(qtys, last_week_start=date(2026, 10, 5)):
+	"""[(week_start, iso_week, qty)] ending at last_week_start, oldest first"""
+	starts = [last_week_start - timedelta(weeks=i) for i in range(len(qtys) - 1, -1, -1)]
+	return [(start, start.isocalendar()[1], qty) for start, qty in zip(starts, qtys)]
+
+
+class TestPercentile(unittest.TestCase):
+	def test_interpolates_between_values(self):
+		self.assertEqual(percentile([1, 2, 3, 4], 50), 2.5)
+		self.assertEqual(percentile([1, 2, 3, 4], 100), 4)
+
+	def test_empty(self):
+		self.assertEqual(percentile([], 90), 0.0)
+
+
+class TestDailySeriesStats(unittest.TestCase):
+	def test_missing_days_count_as_zero(self):
+		stats = DailySeriesStats(window_days=10)
+		for qty in (5, 5):
+			stats.add(qty)
+
+		summary = stats.summary()
+		self.assertEqual(summary["total"], 10)
+		self.assertEqual(summary["average"], 1)
+		self.assertEqual(summary["minimum"], 0)
+		self.assertEqual(summary["p50"], 0)
+		self.assertEqual(summary["active_days"], 2)
+
+
+class TestLinearSlope(unittest.TestCase):
+	def test_slope(self):
+		self.assertAlmostEqual(linear_slope([1, 3, 5, 7]), 2)
+		self.assertEqual(linear_slope([4]), 0.0)
+
+
+class TestSeasonality(unittest.TestCase):
+	def test_leading_zero_weeks_are_not_history(self):
+		weekly = [(week % 52 + 1, 0) for week in range(94)] + [(week % 52 + 1, 10) for week in range(94, 104)]
+		self.assertEqual(seasonal_indices(weekly), {})
+
+	def test_needs_a_year_of_real_history(self):
+		weekly = [(week % 52 + 1, 10) for week in range(52)]
+		indices = seasonal_indices(weekly)
+		self.assertEqual(len(indices), 52)
+		self.assertAlmostEqual(indices[1], 1.0)
+
+	def test_short_history_keeps_plain_average(self):
+		summary = summarize_weekly_series(weekly_series([0] * 94 + [10] * 10), 4)
+		self.assertEqual(summary["average"], 10)
+		self.assertEqual(summary["seasonal_average"], 10)
+
+	def test_zero_index_for_next_week_keeps_plain_average(self):
+		# Two years of use, but never in the coming ISO week
+		series = weekly_series([10] * 104)
+		next_week = (series[-1][0] + timedelta(days=7)).isocalendar()[1]
+		series = [(start, week, 0 if week == next_week else qty) for start, week, qty in series]
+
+		summary = summarize_weekly_series(series, 4)
+		self.assertEqual(summary["seasonal_average"], summary["average"])
+
+	def test_seasonal_peak_scales_the_average(self):
+		series = weekly_series([10] * 104)
+		next_week = (series[-1][0] + timedelta(days=7)).isocalendar()[1]
+		series = [(start, week, 20 if week == next_week else qty) for start, week, qty in series]
+
+		summary = summarize_weekly_series(series, 4)
+		self.assertGreater(summary["seasonal_average"], summary["average"])
+
+
+class TestForecastDemand(unittest.TestCase):
+	def test_constant_series(self):
+		result = forecast_demand([5] * 20, horizon=4)
+		self.assertAlmostEqual(result["demand"], 20)
+		self.assertAlmostEqual(result["safety_stock"], 0)
+
+	def test_short_series_uses_mean(self):
+		self.assertEqual(forecast_demand([2, 4], horizon=3)["demand"], 9)
+
+	def test_no_history(self):
+		self.assertEqual(forecast_demand([], horizon=3)["demand"], 0.0)
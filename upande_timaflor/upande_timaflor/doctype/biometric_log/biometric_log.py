@@ -1,9 +1,211 @@
 # Copyright (c) 2025, newton@upande.com and contributors
 # For license information, please see license.txt
 
-# import frappe
+import json
+
+import frappe
+from frappe import _
 from frappe.model.document import Document
+from frappe.utils import add_to_date, cint, get_datetime, now, now_datetime
+
+LATEST_PUNCH_CACHE_KEY = "upande_timaflor:latest_biometric_punch"
+# Hash key for the latest punch across all devices
+ANY_DEVICE = "__any__"
+DEFAULT_WINDOW_SECONDS = 30
+MAX_WINDOW_SECONDS = 3600
+PUNCH_FIELDS = ("employee", "biometric_id", "timestamp", "employee_name", "device_id")
+EMPLOYEE_MAP_CACHE_KEY = "upande_timaflor:biometric_employee_map"
+EVENT_TYPES = ("Check-In", "Check-Out", "Item-Pickup")
+INGEST_CHUNK_SIZE = 1000
 
 
 class BiometricLog(Document):
-	pass
+    def after_insert(self):
+        update_latest_punch([self])
+
+    def on_trash(self):
+        clear_latest_punch()
+
+
+def on_doctype_update():
+    frappe.db.add_index("Biometric Log", ["timestamp"])
+    # A punch is one (biometric_id, timestamp), whichever device sent it
+    frappe.db.add_unique("Biometric Log", ["biometric_id", "timestamp"], constraint_name="unique_punch")
+    frappe.db.add_index("Biometric Log", ["device_id", "timestamp"])
+
+
+def update_latest_punch(logs, include_any_device=True):
+    """Keep the newest punch per device (and overall) in Redis
+
+    Pass include_any_device=False when `logs` were read for one device only: they
+    say nothing about newer punches on other devices.
+    """
+    cache = frappe.cache()
+    latest = {}
+    for log in logs:
+        punch = {field: log.get(field) for field in PUNCH_FIELDS}
+        punch["timestamp"] = get_datetime(punch["timestamp"])
+        for device in filter(None, (include_any_device and ANY_DEVICE, punch["device_id"])):
+            if device not in latest or punch["timestamp"] >= latest[device]["timestamp"]:
+                latest[device] = punch
+
+    for device, punch in latest.items():
+        current = cache.hget(LATEST_PUNCH_CACHE_KEY, device)
+        if not current or punch["timestamp"] >= current["timestamp"]:
+            cache.hset(LATEST_PUNCH_CACHE_KEY, device, punch)
+
+
+def clear_latest_punch():
+    frappe.cache().delete_value(LATEST_PUNCH_CACHE_KEY)
+
+
+def get_window_seconds(window_seconds=None):
+    window = cint(window_seconds) or cint(frappe.conf.get("biometric_log_window_seconds")) or DEFAULT_WINDOW_SECONDS
+    return min(window, MAX_WINDOW_SECONDS)
+
+
+@frappe.whitelist()
+def get_latest_biometric_log(device_id=None, window_seconds=None):
+    """Most recent punch within a short window, optionally for one device"""
+    window = get_window_seconds(window_seconds)
+    threshold = add_to_date(now_datetime(), seconds=-window)
+    device = device_id or ANY_DEVICE
+
+    punch = frappe.cache().hget(LATEST_PUNCH_CACHE_KEY, device)
+    if punch is None:
+        # Cold cache: one indexed lookup, then remember the result
+        filters = {"timestamp": [">", threshold]}
+        if device_id:
+            filters["device_id"] = device_id
+        logs = frappe.get_all(
+            "Biometric Log",
+            filters=filters,
+            fields=list(PUNCH_FIELDS),
+            order_by="timestamp desc",
+            limit=1
+        )
+        if logs:
+            update_latest_punch(logs, include_any_device=not device_id)
+            punch = logs[0]
+
+    if punch and get_datetime(punch["timestamp"]) > threshold:
+        return punch
+
+    frappe.throw(_("No biometric log found in the last {0} seconds.").format(window))
+
+
+def get_biometric_employee_map():
+    """{attendance device id: (employee, employee_name)} for active employees, cached until an Employee changes"""
+    cache = frappe.cache()
+    employee_map = cache.get_value(EMPLOYEE_MAP_CACHE_KEY)
+    if employee_map is None:
+        employee_map = {
+            str(row.attendance_device_id).strip(): (row.name, row.employee_name)
+            for row in frappe.get_all(
+                "Employee",
+                filters={"attendance_device_id": ("is", "set"), "status": "Active"},
+                fields=["name", "employee_name", "attendance_device_id"]
+            )
+        }
+        cache.set_value(EMPLOYEE_MAP_CACHE_KEY, employee_map)
+    return employee_map
+
+
+def clear_biometric_employee_map(doc=None, method=None):
+    """Employee hook"""
+    frappe.cache().delete_value(EMPLOYEE_MAP_CACHE_KEY)
+
+
+def insert_punches(punches):
+    """One multi-row INSERT IGNORE per chunk, naming rows from the DocType's autoincrement sequence
+
+    Returns the (biometric_id, timestamp) keys actually inserted. Punches already
+    logged, including by a concurrent request, hit the unique key and are skipped.
+    """
+    timestamp = now()
+    user = frappe.session.user
+    sequence = frappe.scrub("Biometric Log_id_seq")
+    inserted = set()
+
+    for i in range(0, len(punches), INGEST_CHUNK_SIZE):
+        chunk = punches[i:i + INGEST_CHUNK_SIZE]
+        placeholders = ", ".join(
+            [f"(NEXTVAL(`{sequence}`), %s, %s, %s, %s, 0, 0, %s, %s, %s, %s, %s, %s)"] * len(chunk)
+        )
+        values = []
+        for p in chunk:
+            values.extend([
+                timestamp, timestamp, user, user,
+                p["biometric_id"], p["timestamp"], p["event_type"],
+                p["employee"], p["employee_name"], p["device_id"]
+            ])
+
+        inserted.update(frappe.db.sql(f"""
+            INSERT IGNORE INTO `tabBiometric Log`
+                (name, creation, modified, modified_by, owner, docstatus, idx,
+                 biometric_id, timestamp, event_type, employee, employee_name, device_id)
+            VALUES {placeholders}
+            RETURNING biometric_id, timestamp
+        """, tuple(values)))
+
+    return {(str(biometric_id), get_datetime(ts)) for biometric_id, ts in inserted}
+
+
+@frappe.whitelist(methods=["POST"])
+def ingest_biometric_logs(logs, device_id=None):
+    """Bulk insert device punches: [{"biometric_id", "timestamp", "event_type"[, "device_id"]}]
+
+    Punches already logged (same biometric_id and timestamp), in the database,
+    by a concurrent request or earlier in the batch, are skipped as duplicates.
+    Punches whose biometric_id matches no active Employee are still stored,
+    unlinked, and counted as unknown.
+    """
+    frappe.has_permission("Biometric Log", "create", throw=True)
+    if isinstance(logs, str):
+        logs = json.loads(logs)
+
+    employee_map = get_biometric_employee_map()
+    result = {"accepted": 0, "duplicates": 0, "unknown": 0, "invalid": 0, "unknown_ids": []}
+
+    punches = {}
+    for log in logs or []:
+        biometric_id = str(log.get("biometric_id") or "").strip()
+        event_type = log.get("event_type")
+        try:
+            timestamp = get_datetime(log.get("timestamp"))
+        except Exception:
+            timestamp = None
+
+        if not biometric_id or not timestamp or event_type not in EVENT_TYPES:
+            result["invalid"] += 1
+            continue
+
+        key = (biometric_id, timestamp)
+        if key in punches:
+            result["duplicates"] += 1
+            continue
+
+        employee, employee_name = employee_map.get(biometric_id, (None, None))
+        punches[key] = {
+            "biometric_id": biometric_id,
+            "timestamp": timestamp,
+            "event_type": event_type,
+            "employee": employee,
+            "employee_name": employee_name,
+            "device_id": log.get("device_id") or device_id
+        }
+
+    new_punches = []
+    if punches:
+        inserted = insert_punches(list(punches.values()))
+        new_punches = [p for key, p in punches.items() if key in inserted]
+        result["duplicates"] += len(punches) - len(new_punches)
+        update_latest_punch(new_punches)
+
+    unknown_ids = {p["biometric_id"] for p in new_punches if not p["employee"]}
+    result.update({
+        "accepted": len(new_punches),
+        "unknown": sum(1 for p in new_punches if not p["employee"]),
+        "unknown_ids": sorted(unknown_ids)
+    })
+    return result
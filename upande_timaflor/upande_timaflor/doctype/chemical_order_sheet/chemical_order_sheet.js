@@ -5,6 +5,12 @@ let farm_area_warning_shown = false;
 let item_stock_cache = {};
 
 frappe.ui.form.on('Chemical Order Sheet', {
+    onload: function(frm) {
+        if (frm.is_new() && !frm.doc.farm_area_to_spray?.length) {
+            frm.trigger('fill_farm_areas');
+        }
+    },
+
     refresh: function(frm) {
         // Pre-fetch stock quantities for all chemicals
         frappe.call({
@@ -62,6 +68,10 @@ frappe.ui.form.on('Chemical Order Sheet', {
             });
         });
 
+        frm.add_custom_button(__('Fill Greenhouse Areas'), function() {
+            frm.trigger('fill_farm_areas');
+        });
+
         // Calculate Button
         frm.add_custom_button(__('Calculate Order Quantities'), function() {
             if (!frm.doc.farm_area_to_spray || frm.doc.farm_area_to_spray.length === 0) {
@@ -132,44 +142,35 @@ frappe.ui.form.on('Chemical Order Sheet', {
         }
     },
 
-    calculate_totals: function(frm) {
-        let total = 0;
-        let promises = [];
-
-        if (frm.doc.order_detail?.length > 0) {
-            frm.doc.order_detail.forEach(item => {
-                if (!item.item) return;
-
-                let total_qty = ['tima_1','tima_2','tima_3','tima_4','tima_5','tima_6','tima_7','jangwani']
-                    .map(f => parseFloat(item[f] || 0)).reduce((a, b) => a + b, 0);
-
-                if (total_qty > 0) {
-                    promises.push(new Promise(resolve => {
-                        frappe.call({
-                            method: 'frappe.client.get_value',
-                            args: {
-                                doctype: 'Item',
-                                filters: { name: item.item },
-                                fieldname: 'valuation_rate'
-                            },
-                            callback: function(r) {
-                                resolve(r.message?.valuation_rate ? total_qty * r.message.valuation_rate : 0);
-                            },
-                            error: function() {
-                                resolve(0);
-                            }
-                        });
-                    }));
+    fill_farm_areas: function(frm) {
+        frappe.call({
+            method: 'upande_timaflor.upande_timaflor.doctype.chemical_order_sheet.chemical_order_sheet.get_farm_area_to_spray',
+            callback: function(r) {
+                if (r.message) {
+                    frm.clear_table('farm_area_to_spray');
+                    Object.assign(frm.add_child('farm_area_to_spray'), r.message);
+                    frm.refresh_field('farm_area_to_spray');
                 }
-            });
+            }
+        });
+    },
 
-            Promise.all(promises).then(values => {
-                total = values.reduce((sum, val) => sum + val, 0);
-                frm.set_value('total_order_amount', total);
-            });
-        } else {
+    calculate_totals: function(frm) {
+        if (!frm.doc.order_detail?.length) {
             frm.set_value('total_order_amount', 0);
+            return;
         }
+
+        // One request values every row; rates come from the farm stores' bins
+        frappe.call({
+            method: 'upande_timaflor.upande_timaflor.doctype.chemical_order_sheet.chemical_order_sheet.calculate_order_totals',
+            args: {
+                order_detail: frm.doc.order_detail
+            },
+            callback: function(r) {
+                frm.set_value('total_order_amount', r.message?.grand_total || 0);
+            }
+        });
     }
 });
 
@@ -225,16 +226,12 @@ frappe.ui.form.on('Area To Spray', {
                 frm.trigger('calculate_orders');
             }
         }, 1000);
-    },
-    
-    tima_1: function(frm, cdt, cdn) { trigger_auto_calc(frm); },
-    tima_2: function(frm, cdt, cdn) { trigger_auto_calc(frm); },
-    tima_3: function(frm, cdt, cdn) { trigger_auto_calc(frm); },
-    tima_4: function(frm, cdt, cdn) { trigger_auto_calc(frm); },
-    tima_5: function(frm, cdt, cdn) { trigger_auto_calc(frm); },
-    tima_6: function(frm, cdt, cdn) { trigger_auto_calc(frm); },
-    tima_7: function(frm, cdt, cdn) { trigger_auto_calc(frm); },
-    jangwani: function(frm, cdt, cdn) { trigger_auto_calc(frm); }
+    }
+});
+
+// One farm column per farm in the registry
+(frappe.boot.farm_columns || []).forEach(({ fieldname }) => {
+    frappe.ui.form.on('Area To Spray', fieldname, function(frm, cdt, cdn) { trigger_auto_calc(frm); });
 });
 
 function trigger_auto_calc(frm) {
@@ -255,8 +252,8 @@ function create_request_for_quotation(frm) {
 
     frm.doc.order_detail.forEach(item => {
         if (!item.item) return;
-        let total_qty = ['tima_1','tima_2','tima_3','tima_4','tima_5','tima_6','tima_7','jangwani']
-            .map(f => parseFloat(item[f] || 0)).reduce((a, b) => a + b, 0);
+        let total_qty = (frappe.boot.farm_columns || [])
+            .map(({ fieldname }) => parseFloat(item[fieldname] || 0)).reduce((a, b) => a + b, 0);
         if (total_qty > 0) {
             items_to_order.push({
                 item_code: item.item,
@@ -299,8 +296,8 @@ function create_purchase_order(frm, require_supplier = true) {
 
     frm.doc.order_detail.forEach(item => {
         if (!item.item) return;
-        let total_qty = ['tima_1','tima_2','tima_3','tima_4','tima_5','tima_6','tima_7','jangwani']
-            .map(f => parseFloat(item[f] || 0)).reduce((a, b) => a + b, 0);
+        let total_qty = (frappe.boot.farm_columns || [])
+            .map(({ fieldname }) => parseFloat(item[fieldname] || 0)).reduce((a, b) => a + b, 0);
         if (total_qty > 0) {
             items_to_order.push({
                 item_code: item.item,
@@ -5,94 +5,55 @@ import frappe
 from frappe.model.document import Document
 import json
 from frappe.utils import flt
+from upande_timaflor.farms import get_farm_areas, get_farm_fields
+from upande_timaflor.instrumentation import instrumented
+from upande_timaflor.items import get_agro_item_details, get_agro_items
+from upande_timaflor.stock import get_stock_snapshot, get_valuation_rates
 
 class ChemicalOrderSheet(Document):
     def validate(self):
-        pass
+        if not self.get("farm_area_to_spray"):
+            self.append("farm_area_to_spray", get_farm_areas())
 
 @frappe.whitelist()
+@instrumented
+def get_farm_area_to_spray():
+    """Greenhouse area per farm column, to prefill the Area To Spray table"""
+    return get_farm_areas()
+
+@frappe.whitelist()
+@instrumented
 def get_stock_for_all_chemicals():
     """Get stock quantities for all chemicals at once"""
     try:
-        stock_data = {}
-        chemicals = frappe.get_all("Item", 
-            filters={"item_group": "Chemical", "disabled": 0},
-            fields=["name"]
-        )
-        
-        for chem in chemicals:
-            stock_data[chem["name"]] = get_item_stock(chem["name"])
-            
-        return stock_data
+        snapshot = get_stock_snapshot("Chemical")
+        return {item_code: flt(stock["total"]) for item_code, stock in snapshot.items()}
     except Exception as e:
         frappe.log_error(f"Stock fetch error: {str(e)}")
         return {}
 
 @frappe.whitelist()
+@instrumented
 def get_all_chemicals_with_details():
     """Get chemicals with guaranteed field names"""
     try:
-        fields = ["name", "item_name"]
-        custom_fields = {
-            "application_rate": "custom_application_rate_per_ha",
-            "required_sprays": "custom_advised_no_sprays",
-            "number_of_sprays": "custom_no_of_sprays"
-        }
-        
-        # Add existing custom fields
-        meta = frappe.get_meta("Item")
-        for field, df in custom_fields.items():
-            if meta.has_field(df):
-                fields.append(f"`{df}` as {field}")
-        
-        chemicals = frappe.get_all("Item",
-            filters={"item_group": "Chemical", "disabled": 0},
-            fields=fields
-        )
-        
-        # Fallback for missing custom fields
-        for chem in chemicals:
-            chem.setdefault("application_rate", 0)
-            chem.setdefault("required_sprays", 0)
-            chem.setdefault("number_of_sprays", 0)
-        
-        return chemicals
+        return get_agro_items("Chemical")
     except Exception as e:
         frappe.log_error(f"Chemical fetch error: {str(e)}")
         return []
 
 @frappe.whitelist()
+@instrumented
 def get_chemical_details(item_code):
     """Get details for a single chemical"""
     try:
-        fields = ["item_name"]
-        custom_fields = {
-            "application_rate": "custom_application_rate_per_ha",
-            "required_sprays": "custom_advised_no_sprays",
-            "number_of_sprays": "custom_no_of_sprays"
-        }
-        
-        # Add existing custom fields
-        meta = frappe.get_meta("Item")
-        for field, df in custom_fields.items():
-            if meta.has_field(df):
-                fields.append(f"`{df}` as {field}")
-        
-        chem = frappe.db.get_value("Item", item_code, fields, as_dict=True)
-        
-        # Fallback for missing custom fields
-        if chem:
-            chem.setdefault("application_rate", 0)
-            chem.setdefault("required_sprays", 0)
-            chem.setdefault("number_of_sprays", 0)
-            return chem
-            
-        return {}
+        return get_agro_item_details([item_code]).get(item_code) or {}
     except Exception as e:
         frappe.log_error(f"Chemical details error: {str(e)}")
         return {}
 
 @frappe.whitelist()
+@instrumented
 def calculate_order_quantities(doc, stock_data=None):
     """Calculate with correct formula and stock deduction"""
     try:
@@ -102,56 +63,34 @@ def calculate_order_quantities(doc, stock_data=None):
         if not doc.get("farm_area_to_spray") or not doc.get("spray_details"):
             return []
 
-        # 1. Calculate total area per greenhouse
-        area_totals = {
-            "tima_1": 0, "tima_2": 0, "tima_3": 0, "tima_4": 0,
-            "tima_5": 0, "tima_6": 0, "tima_7": 0, "jangwani": 0
-        }
-        
-        for area in doc.get("farm_area_to_spray", []):
-            for field in area_totals.keys():
-                area_totals[field] += flt(area.get(field, 0))
+        sprays = [spray for spray in doc.get("spray_details", []) if spray.get("chemical")]
+        if not sprays:
+            return []
+
+        # 1. Area vector: total area per farm column
+        farm_fields = get_farm_fields()
+        areas = [
+            sum(flt(area.get(field, 0)) for area in doc.get("farm_area_to_spray", []))
+            for field in farm_fields
+        ]
+
+        # 2. Per-chemical dose (rate x sprays) and stock, with names resolved in bulk
+        item_codes = [spray["chemical"] for spray in sprays]
+        doses = [
+            flt(spray.get("application_rate_per_hectare", 0)) * flt(spray.get("number_of_sprays", 0))
+            for spray in sprays
+        ]
+        stocks = [flt(stock_data.get(item_code, 0)) for item_code in item_codes]
+        item_details = get_agro_item_details(item_codes)
+
+        # 3. Chemicals x greenhouses requirement matrix net of stock
+        matrix = build_requirement_matrix(areas, doses, stocks)
 
-        # 2. Calculate required quantity per chemical
         order_details = []
-        for spray in doc.get("spray_details", []):
-            if not spray.get("chemical"):
-                continue
-                
-            item_code = spray["chemical"]
-            item_name = frappe.db.get_value("Item", item_code, "item_name") or item_code
-            
-            # Get parameters with defaults
-            app_rate = flt(spray.get("application_rate_per_hectare", 0))
-            num_sprays = flt(spray.get("number_of_sprays", 0))
-            current_stock = flt(stock_data.get(item_code, 0))
-            
-            # Calculate total required
-            required_total = 0
-            order_row = {"item": item_code, "item_name": item_name}
-            
-            # Initialize all greenhouse fields to 0
-            for field in area_totals.keys():
-                order_row[field] = 0
-            
-            # Calculate requirements per greenhouse
-            for field, area in area_totals.items():
-                field_required = area * app_rate * num_sprays
-                required_total += field_required
-                order_row[field] = field_required
-            
-            # 3. Deduct stock from total
-            if current_stock > 0 and required_total > 0:
-                if current_stock >= required_total:
-                    # Enough stock - no order needed
-                    for field in area_totals.keys():
-                        order_row[field] = 0
-                else:
-                    # Partial stock - deduct proportionally
-                    deduction_ratio = (required_total - current_stock) / required_total
-                    for field in area_totals.keys():
-                        order_row[field] = flt(order_row[field] * deduction_ratio, 2)
-            
+        for item_code, row in zip(item_codes, matrix):
+            details = item_details.get(item_code)
+            order_row = {"item": item_code, "item_name": (details and details.item_name) or item_code}
+            order_row.update(zip(farm_fields, row))
             order_details.append(order_row)
             
         return order_details
@@ -161,6 +100,59 @@ def calculate_order_quantities(doc, stock_data=None):
         return []
 
 @frappe.whitelist()
+@instrumented
+def calculate_order_totals(order_detail):
+    """Value every order row at its farms' valuation rates, with all rates fetched in bulk"""
+    try:
+        order_detail = json.loads(order_detail) if isinstance(order_detail, str) else order_detail or []
+        rows = [row for row in order_detail if row.get("item")]
+        rates = get_valuation_rates([row["item"] for row in rows], "Chemical")
+        farm_fields = get_farm_fields()
+
+        totals = []
+        for row in rows:
+            item_rates = rates.get(row["item"], {})
+            qty = sum(flt(row.get(field)) for field in farm_fields)
+            amount = sum(flt(row.get(field)) * flt(item_rates.get(field)) for field in farm_fields)
+            totals.append({
+                "item": row["item"],
+                "qty": qty,
+                "rate": flt(amount / qty) if qty else flt(item_rates.get("rate")),
+                "amount": flt(amount, 2)
+            })
+
+        return {"rows": totals, "grand_total": flt(sum(row["amount"] for row in totals), 2)}
+
+    except Exception as e:
+        frappe.log_error(f"Order totals error: {str(e)}")
+        return {}
+
+def build_requirement_matrix(areas, doses, stocks):
+    """Requirement per chemical and greenhouse (outer product of doses and areas), less stock
+
+    Where stock covers part of a chemical's total, every greenhouse is scaled down by
+    the same ratio; where it covers all of it, the row is zero.
+    """
+    total_area = sum(areas)
+    matrix = []
+
+    for dose, stock in zip(doses, stocks):
+        row = [area * dose for area in areas]
+        required_total = total_area * dose
+
+        if stock > 0 and required_total > 0:
+            if stock >= required_total:
+                row = [0] * len(areas)
+            else:
+                ratio = (required_total - stock) / required_total
+                row = [flt(value * ratio, 2) for value in row]
+
+        matrix.append(row)
+
+    return matrix
+
+@frappe.whitelist()
+@instrumented
 def get_item_stock(item_code):
     """Get current stock quantity for an item"""
     try:
@@ -0,0 +1,173 @@
+# Copyright (c) 2025, newton@upande.com and contributors
+# For license information, please see license.txt
+
+import hashlib
+
+import frappe
+from frappe import _
+from frappe.model.document import Document
+from frappe.utils import flt, getdate, now
+
+
+class FarmDailyConsumption(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("Farm Daily Consumption", ["item_code", "posting_date"])
+    # Change detection and the date-range rebuild of the hourly weekly refresh
+    frappe.db.add_index("Farm Daily Consumption", ["modified"])
+    frappe.db.add_index("Farm Daily Consumption", ["posting_date"])
+
+
+def get_rollup_name(item_code, farm, posting_date):
+    """Deterministic row name for an (item_code, farm, posting_date) key"""
+    key = "::".join([item_code, farm or "", str(getdate(posting_date))])
+    return hashlib.md5(key.encode("utf-8")).hexdigest()
+
+
+def get_consumed_qty(actual_qty, is_cancelled):
+    """Outgoing qty counted as consumption, mirroring `actual_qty < 0 AND is_cancelled = 0`"""
+    # ERPNext cancels a voucher by flagging its entries and posting reversals
+    # (also flagged) on the same date, so a flagged inflow undoes an earlier issue
+    if (not is_cancelled and actual_qty < 0) or (is_cancelled and actual_qty > 0):
+        return actual_qty
+    return 0
+
+
+def update_consumption_rollup(doc, method=None):
+    """Stock Ledger Entry on_submit hook: fold the entry into its daily farm bucket
+
+    Ledger entries are never cancelled as documents. Cancelling a voucher flags
+    its entries is_cancelled and submits reversal entries, which arrive here like
+    any other entry and net the bucket back to zero, so no cancel hook is needed.
+    """
+    actual_qty = flt(doc.actual_qty)
+    if not actual_qty:
+        return
+
+    farm = frappe.get_cached_value("Warehouse", doc.warehouse, "farm") or ""
+    upsert_rollup_rows([{
+        "item_code": doc.item_code,
+        "farm": farm,
+        "posting_date": doc.posting_date,
+        "actual_qty": actual_qty,
+        "consumed_qty": get_consumed_qty(actual_qty, doc.is_cancelled)
+    }])
+
+
+def upsert_rollup_rows(rows):
+    """Add quantities to existing buckets, creating missing ones"""
+    if not rows:
+        return
+
+    timestamp = now()
+    user = frappe.session.user
+    values = []
+    for row in rows:
+        values.append((
+            get_rollup_name(row["item_code"], row["farm"], row["posting_date"]),
+            timestamp, timestamp, user, user,
+            row["item_code"], row["farm"], getdate(row["posting_date"]),
+            flt(row["actual_qty"]), flt(row["consumed_qty"])
+        ))
+
+    placeholders = ", ".join(["(%s, %s, %s, %s, %s, 0, 0, %s, %s, %s, %s, %s)"] * len(values))
+    frappe.db.sql(f"""
+        INSERT INTO `tabFarm Daily Consumption`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             item_code, farm, posting_date, actual_qty, consumed_qty)
+        VALUES {placeholders}
+        ON DUPLICATE KEY UPDATE
+            actual_qty = actual_qty + VALUES(actual_qty),
+            consumed_qty = consumed_qty + VALUES(consumed_qty),
+            modified = VALUES(modified)
+    """, tuple(v for row in values for v in row))
+
+
+@frappe.whitelist()
+def rebuild_farm_daily_consumption(from_date=None, to_date=None):
+    """Rebuild the rollup from the Stock Ledger for a date range (all history by default)"""
+    frappe.only_for("System Manager")
+
+    conditions = []
+    params = {"user": frappe.session.user, "timestamp": now()}
+    if from_date:
+        conditions.append("posting_date >= %(from_date)s")
+        params["from_date"] = getdate(from_date)
+    if to_date:
+        conditions.append("posting_date <= %(to_date)s")
+        params["to_date"] = getdate(to_date)
+
+    rollup_where = " AND ".join(conditions) or "1=1"
+    ledger_where = " AND ".join(f"sle.{c}" for c in conditions) or "1=1"
+
+    frappe.db.sql(f"DELETE FROM `tabFarm Daily Consumption` WHERE {rollup_where}", params)
+    frappe.db.sql(f"""
+        INSERT INTO `tabFarm Daily Consumption`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             item_code, farm, posting_date, actual_qty, consumed_qty)
+        SELECT
+            MD5(CONCAT_WS('::', sle.item_code, IFNULL(w.farm, ''), sle.posting_date)),
+            %(timestamp)s, %(timestamp)s, %(user)s, %(user)s, 0, 0,
+            sle.item_code,
+            IFNULL(w.farm, ''),
+            sle.posting_date,
+            SUM(sle.actual_qty),
+            SUM(CASE WHEN sle.is_cancelled = 0 AND sle.actual_qty < 0 THEN sle.actual_qty ELSE 0 END)
+        FROM `tabStock Ledger Entry` sle
+        LEFT JOIN `tabWarehouse` w ON sle.warehouse = w.name
+        WHERE {ledger_where}
+        GROUP BY sle.item_code, IFNULL(w.farm, ''), sle.posting_date
+    """, params)
+
+    frappe.db.commit()
+    return frappe.db.count("Farm Daily Consumption")
+
+
+def get_daily_farm_consumption(item_codes, from_date, to_date, chunk_size=500, qty_field="actual_qty"):
+    """Daily stock movement per item and farm, read from the rollup in chunked IN-list queries
+
+    `qty_field` picks the net movement (actual_qty) or the outgoing consumption
+    only (consumed_qty).
+    """
+    if qty_field not in ("actual_qty", "consumed_qty"):
+        frappe.throw(_("Invalid quantity field: {0}").format(qty_field))
+
+    item_codes = list(dict.fromkeys(item_codes or []))
+    rows = []
+
+    for i in range(0, len(item_codes), chunk_size):
+        rows.extend(frappe.db.sql(f"""
+            SELECT
+                item_code,
+                farm,
+                posting_date,
+                {qty_field} AS daily_qty
+            FROM `tabFarm Daily Consumption`
+            WHERE
+                item_code IN %(item_codes)s
+                AND posting_date BETWEEN %(from_date)s AND %(to_date)s
+                AND farm != ''
+        """, {
+            "item_codes": item_codes[i:i + chunk_size],
+            "from_date": from_date,
+            "to_date": to_date
+        }, as_dict=True))
+
+    return rows
+
+
+def get_consumed_totals(item_codes, from_date, to_date):
+    """Total consumed qty per item over a window, across all warehouses"""
+    if not item_codes:
+        return {}
+
+    return dict(frappe.db.sql("""
+        SELECT item_code, SUM(consumed_qty)
+        FROM `tabFarm Daily Consumption`
+        WHERE
+            item_code IN %(item_codes)s
+            AND posting_date BETWEEN %(from_date)s AND %(to_date)s
+        GROUP BY item_code
+    """, {"item_codes": list(item_codes), "from_date": from_date, "to_date": to_date}))
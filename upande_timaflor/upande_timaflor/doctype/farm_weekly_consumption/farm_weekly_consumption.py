@@ -0,0 +1,124 @@
+# Copyright (c) 2025, newton@upande.com and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, getdate, now, nowdate
+
+from upande_timaflor.consumption import SEASONAL_HISTORY_WEEKS, summarize_weekly_series
+
+LAST_REFRESH_KEY = "upande_timaflor_weekly_consumption_refreshed"
+WEEK_START = "DATE_SUB(posting_date, INTERVAL WEEKDAY(posting_date) DAY)"
+
+
+class FarmWeeklyConsumption(Document):
+    pass
+
+
+def on_doctype_update():
+    frappe.db.add_index("Farm Weekly Consumption", ["item_code", "week_start"])
+
+
+def get_week_start(date):
+    date = getdate(date)
+    return add_days(date, -date.weekday())
+
+
+def refresh_weekly_consumption(from_date=None, to_date=None):
+    """Rebuild the ISO-week buckets covering a date range from Farm Daily Consumption"""
+    # Daily rows are filtered on the bare posting_date so the range can use its index
+    weekly_conditions, daily_conditions = [], []
+    params = {"user": frappe.session.user, "timestamp": now()}
+    if from_date:
+        weekly_conditions.append("week_start >= %(from_week)s")
+        daily_conditions.append("posting_date >= %(from_week)s")
+        params["from_week"] = get_week_start(from_date)
+    if to_date:
+        weekly_conditions.append("week_start <= %(to_week)s")
+        daily_conditions.append("posting_date < %(after_to_week)s")
+        params["to_week"] = get_week_start(to_date)
+        params["after_to_week"] = add_days(params["to_week"], 7)
+
+    weekly_where = " AND ".join(weekly_conditions) or "1=1"
+    daily_where = " AND ".join(daily_conditions) or "1=1"
+
+    frappe.db.sql(f"DELETE FROM `tabFarm Weekly Consumption` WHERE {weekly_where}", params)
+    frappe.db.sql(f"""
+        INSERT INTO `tabFarm Weekly Consumption`
+            (name, creation, modified, modified_by, owner, docstatus, idx,
+             item_code, farm, week_start, iso_year, iso_week, consumed_qty)
+        SELECT
+            MD5(CONCAT_WS('::', item_code, farm, {WEEK_START})),
+            %(timestamp)s, %(timestamp)s, %(user)s, %(user)s, 0, 0,
+            item_code,
+            farm,
+            {WEEK_START},
+            YEARWEEK(posting_date, 3) DIV 100,
+            YEARWEEK(posting_date, 3) MOD 100,
+            -SUM(consumed_qty)
+        FROM `tabFarm Daily Consumption`
+        WHERE {daily_where}
+        GROUP BY item_code, farm, {WEEK_START}
+        HAVING SUM(consumed_qty) != 0
+    """, params)
+
+
+def refresh_changed_weeks():
+    """Scheduler job: rebuild only the weeks whose daily buckets changed since the last run"""
+    started = now()
+    last_refresh = frappe.db.get_global(LAST_REFRESH_KEY)
+
+    if not last_refresh:
+        refresh_weekly_consumption()
+    else:
+        from_date, to_date = frappe.db.sql("""
+            SELECT MIN(posting_date), MAX(posting_date)
+            FROM `tabFarm Daily Consumption`
+            WHERE modified >= %s
+        """, last_refresh)[0]
+        if from_date:
+            refresh_weekly_consumption(from_date, to_date)
+
+    frappe.db.set_global(LAST_REFRESH_KEY, started)
+    frappe.db.commit()
+
+
+@frappe.whitelist()
+def rebuild_farm_weekly_consumption(from_date=None, to_date=None):
+    """Rebuild the weekly materialization for a date range (all history by default)"""
+    frappe.only_for("System Manager")
+    refresh_weekly_consumption(from_date, to_date)
+    frappe.db.commit()
+    return frappe.db.count("Farm Weekly Consumption")
+
+
+def get_weekly_consumption_summary(item_codes, weeks):
+    """Rolling means, trend and seasonal average per item over complete ISO weeks, all farms combined"""
+    last_week = add_days(get_week_start(nowdate()), -7)
+    history = max(weeks, SEASONAL_HISTORY_WEEKS)
+    week_starts = [add_days(last_week, -7 * i) for i in range(history - 1, -1, -1)]
+
+    consumption = {}
+    if item_codes:
+        for row in frappe.db.sql("""
+            SELECT item_code, week_start, SUM(consumed_qty) AS qty
+            FROM `tabFarm Weekly Consumption`
+            WHERE
+                item_code IN %(item_codes)s
+                AND week_start BETWEEN %(from_week)s AND %(to_week)s
+            GROUP BY item_code, week_start
+        """, {
+            "item_codes": list(item_codes),
+            "from_week": week_starts[0],
+            "to_week": last_week
+        }, as_dict=True):
+            consumption[(row.item_code, getdate(row.week_start))] = row.qty
+
+    summaries = {}
+    for item_code in item_codes:
+        series = [
+            (week_start, week_start.isocalendar()[1], consumption.get((item_code, week_start), 0))
+            for week_start in week_starts
+        ]
+        summaries[item_code] = summarize_weekly_series(series, weeks)
+    return summaries
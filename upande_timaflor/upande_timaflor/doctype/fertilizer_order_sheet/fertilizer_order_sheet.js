@@ -500,7 +500,6 @@ function update_stock_wanted_for_all_rows(frm) {
 function calculate_order_quantities(frm) {
     // Validate data before calculation
     let consumption_data = frm.doc.weekly_average_consumption || [];
-    let stock_data = frm.doc.stock_levels || [];
 
     if (consumption_data.length === 0) {
         frappe.msgprint({
@@ -511,15 +510,6 @@ function calculate_order_quantities(frm) {
         return;
     }
 
-    if (stock_data.length === 0) {
-        frappe.msgprint({
-            title: __('No Stock Data'),
-            indicator: 'orange',
-            message: __('Please refresh stock levels first using "Refresh Stock Levels" button.')
-        });
-        return;
-    }
-
     // Check for invalid rows
     let invalid_rows = consumption_data.filter(row => 
         !row.item || !row.item_name || 
@@ -541,21 +531,10 @@ function calculate_order_quantities(frm) {
 
 function calculate_order_quantities_after_validation(frm) {
     let consumption_data = frm.doc.weekly_average_consumption || [];
-    let stock_data = frm.doc.stock_levels || [];
     let main_avg_consumption = parseFloat(frm.doc.average_consumption) || 0;
     let main_stock_wanted_weeks = parseFloat(frm.doc.stock_wanted_weeks) || 0;
 
-    // Create stock lookup map
-    let stock_map = {};
-    stock_data.forEach(stock => {
-        stock_map[stock.item_code] = parseFloat(stock.total_stock) || 0;
-        stock_map[stock.item_name] = parseFloat(stock.total_stock) || 0;
-        stock_map[stock.item] = parseFloat(stock.total_stock) || 0;
-    });
-
-    // Clear and populate order quantity table
-    frm.clear_table('order_quantity');
-    let calculated_count = 0;
+    let consumption_rows = [];
     let skipped_count = 0;
 
     // Filter and sort valid consumption data
@@ -573,63 +552,72 @@ function calculate_order_quantities_after_validation(frm) {
         let stock_wanted_weeks = row_stock_wanted_weeks > 0 ? row_stock_wanted_weeks : main_stock_wanted_weeks;
 
         if (avg_consumption > 0 && stock_wanted_weeks > 0) {
-            // Look up current stock using multiple keys
-            let current_stock = stock_map[consumption.item] || 
-                              stock_map[consumption.item_name] || 
-                              0;
-            
-            let required_stock = avg_consumption * stock_wanted_weeks;
-            let order_qty = Math.ceil(Math.max(0, required_stock - current_stock));
-            
-            // Add to order quantity table
-            frm.add_child('order_quantity', {
-                item: consumption.item,  // Item code
-                item_name: consumption.item_name,  // Item name
-                current_stock: current_stock,
-                average_consumption_per_week: avg_consumption,
-                weeks_to_order_for: stock_wanted_weeks,
-                required_stock: required_stock,
-                calculated_order_quantity: order_qty
+            consumption_rows.push({
+                item: consumption.item,
+                item_name: consumption.item_name,
+                average_consumption: avg_consumption,
+                stock_wanted_weeks: stock_wanted_weeks
             });
-            calculated_count++;
         } else {
             skipped_count++;
         }
     });
 
-    frm.refresh_field('order_quantity');
-    
-    if (calculated_count > 0) {
-        frm.save().then(() => {
-            frappe.show_alert({
-                message: __('Calculated order quantities for {0} items').replace('{0}', calculated_count) + 
-                        (skipped_count > 0 ? __(', skipped {0} items').replace('{0}', skipped_count) : ''),
-                indicator: 'green'
-            }, 5);
-        });
-    } else {
+    if (consumption_rows.length === 0) {
         frappe.msgprint(__('No items met the criteria for order calculation.'));
+        return;
     }
+
+    // Stock on hand and on open POs, minimum order qty and pack sizes are applied on the server
+    frappe.call({
+        method: 'upande_timaflor.upande_timaflor.doctype.fertilizer_order_sheet.fertilizer_order_sheet.calculate_net_order_quantities',
+        args: {
+            consumption_rows: consumption_rows
+        },
+        freeze: true,
+        freeze_message: __('Calculating order quantities...'),
+        callback: function(r) {
+            if (!r.message || r.message.error) {
+                frappe.msgprint({
+                    title: __('Error'),
+                    indicator: 'red',
+                    message: r.message?.error || __('An unknown error occurred during calculation.')
+                });
+                return;
+            }
+
+            // Clear and populate order quantity table
+            frm.clear_table('order_quantity');
+            r.message.forEach(row => {
+                frm.add_child('order_quantity', row);
+            });
+            frm.refresh_field('order_quantity');
+
+            frm.save().then(() => {
+                frappe.show_alert({
+                    message: __('Calculated order quantities for {0} items').replace('{0}', r.message.length) + 
+                            (skipped_count > 0 ? __(', skipped {0} items').replace('{0}', skipped_count) : ''),
+                    indicator: 'green'
+                }, 5);
+            });
+        }
+    });
 }
 
 function update_stock_table(frm, data) {
     frm.clear_table('stock_levels');
     
     data.sort((a, b) => a.item_name.localeCompare(b.item_name)).forEach(item => {
-        frm.add_child('stock_levels', {
+        let row = {
             item: item.item_code,  // Item code
             item_name: item.item_name,  // Item name
             item_code: item.item_code,  // Explicit item code
-            tima_1: parseFloat(item.tima_1) || 0,
-            tima_2: parseFloat(item.tima_2) || 0,
-            tima_3: parseFloat(item.tima_3) || 0,
-            tima_4: parseFloat(item.tima_4) || 0,
-            tima_5: parseFloat(item.tima_5) || 0,
-            tima_6: parseFloat(item.tima_6) || 0,
-            tima_7: parseFloat(item.tima_7) || 0,
-            jangwani: parseFloat(item.jangwani) || 0,
             total_stock: parseFloat(item.total_stock) || 0
+        };
+        (frappe.boot.farm_columns || []).forEach(({ fieldname }) => {
+            row[fieldname] = parseFloat(item[fieldname]) || 0;
         });
+        frm.add_child('stock_levels', row);
     });
     
     frm.refresh_field('stock_levels');
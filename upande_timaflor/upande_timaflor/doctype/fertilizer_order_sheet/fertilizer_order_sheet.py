@@ -1,22 +1,32 @@
+import json
+import math
+
 import frappe
 from frappe import _
-from frappe.utils import flt, nowdate, add_to_date  
+from frappe.utils import cint, flt
+from upande_timaflor.farms import get_farm_registry, get_farm_warehouse_map
+from upande_timaflor.instrumentation import instrumented
+from upande_timaflor.requirements import get_purchase_constraints, round_order_qty
+from upande_timaflor.stock import get_available_matrix, get_stock_matrix
+from upande_timaflor.upande_timaflor.doctype.farm_weekly_consumption.farm_weekly_consumption import (
+    get_weekly_consumption_summary
+)
 
 
 @frappe.whitelist()
+@instrumented
 def calculate_historical_consumption(weeks_to_calculate):
     """
-    Calculates the average weekly consumption of fertilizer items based on historical
-    Stock Ledger Entries over a specified number of weeks.
+    Calculates the average weekly consumption of fertilizer items over the last
+    N complete ISO weeks, read from the Farm Weekly Consumption materialization.
+    Each row also carries the 4/8/12/26-week rolling means, the trend (change in
+    weekly consumption per week) and a seasonality-adjusted average.
     """
     try:
-        weeks = flt(weeks_to_calculate)
+        weeks = cint(weeks_to_calculate)
         if weeks <= 0:
             frappe.throw(_("Number of weeks must be a positive number."))
 
-        to_date = nowdate()
-        from_date = add_to_date(to_date, weeks=-weeks)
-
         fertilizer_items = frappe.get_all("Item",
             filters={"item_group": "Fertilizer", "disabled": 0},
             fields=["name", "item_name"]
@@ -24,40 +34,18 @@ def calculate_historical_consumption(weeks_to_calculate):
         if not fertilizer_items:
             return []
 
-        fertilizer_item_codes = [item['name'] for item in fertilizer_items]
-
-        consumption_data = frappe.db.sql("""
-            SELECT
-                item_code,
-                SUM(actual_qty) as total_consumed
-            FROM `tabStock Ledger Entry`
-            WHERE
-                item_code IN %(item_codes)s
-                AND posting_date BETWEEN %(from_date)s AND %(to_date)s
-                AND actual_qty < 0
-                AND is_cancelled = 0
-            GROUP BY
-                item_code
-        """, {
-            "item_codes": fertilizer_item_codes,
-            "from_date": from_date,
-            "to_date": to_date
-        }, as_dict=1)
-
-        consumption_map = {
-            entry.item_code: abs(entry.total_consumed) for entry in consumption_data
-        }
+        summaries = get_weekly_consumption_summary([item['name'] for item in fertilizer_items], weeks)
 
         result = []
         for item in fertilizer_items:
-            total_consumed = flt(consumption_map.get(item['name'], 0))
-            average_consumption = flt(total_consumed / weeks, 2)
-
-            result.append({
+            summary = summaries[item['name']]
+            row = {
                 "item_code": item['name'],
                 "item_name": item['item_name'] or item['name'],
-                "average_consumption": average_consumption
-            })
+                "average_consumption": flt(summary["average"], 2)
+            }
+            row.update({key: flt(value, 2) for key, value in summary.items() if key != "average"})
+            result.append(row)
 
         return result
 
@@ -68,74 +56,60 @@ def calculate_historical_consumption(weeks_to_calculate):
 
 
 @frappe.whitelist()
-def get_warehouse_specific_stock():
+@instrumented
+def calculate_net_order_quantities(consumption_rows):
+    """Quantity To Order rows for the shortfall after stock and open POs in the fertilizer stores
+
+    consumption_rows: [{"item", "item_name", "average_consumption", "stock_wanted_weeks"}].
+    Orders are rounded up to the item's minimum order qty and purchase pack size;
+    items with nothing to order are left out.
+    """
     try:
-        WAREHOUSE_MAP = {
-            'Fertilizer Store -T1 - T': 'tima_1',
-            'Fertilizer Store -T2 - T': 'tima_2', 
-            'Fertilizer Store -T3 - T': 'tima_3',
-            'Fertilizer Store -T4 - T': 'tima_4',
-            'Fertilizer Store -T5 - T': 'tima_5',
-            'Fertilizer Store -T6 - T': 'tima_6',
-            'Fertilizer Store -T7 - T': 'tima_7',
-            'Jangwani Stores - TFL': 'jangwani'
-        }
+        if isinstance(consumption_rows, str):
+            consumption_rows = json.loads(consumption_rows)
 
-        # Get all fertilizer items with proper validation
-        items = frappe.get_all("Item",
-            filters={"item_group": "Fertilizer", "disabled": 0},
-            fields=["name", "item_name"],
-            order_by="item_name"
-        )
+        item_codes = [row["item"] for row in consumption_rows]
+        available = get_available_matrix(item_codes, "Fertilizer")
+        constraints = get_purchase_constraints(item_codes)
 
-        if not items:
-            frappe.log_error("No fertilizer items found", "Stock Error")
-            return {"error": "No fertilizer items found in the system"}
+        result = []
+        for row in consumption_rows:
+            average_consumption = flt(row.get("average_consumption"))
+            stock_wanted_weeks = flt(row.get("stock_wanted_weeks"))
+            current_stock = flt(sum(flt(qty) for qty in available.get(row["item"], {}).values()), 2)
+            required_stock = average_consumption * stock_wanted_weeks
+
+            min_order_qty, pack_size = constraints.get(row["item"], (0.0, 1.0))
+            shortfall = math.ceil(max(0, required_stock - current_stock))
+            order_qty = round_order_qty(shortfall, min_order_qty, pack_size)
+            if order_qty <= 0:
+                continue
 
-        # Get stock data with better error handling
-        stock_data = frappe.db.sql("""
-            SELECT b.item_code, i.item_name, b.warehouse, SUM(b.actual_qty) as qty
-            FROM `tabBin` b
-            JOIN `tabItem` i ON b.item_code = i.name
-            WHERE b.warehouse IN %(warehouses)s
-            AND i.item_group = 'Fertilizer'
-            AND i.disabled = 0
-            GROUP BY b.item_code, b.warehouse
-        """, {"warehouses": list(WAREHOUSE_MAP.keys())}, as_dict=1)
+            result.append({
+                "item": row["item"],
+                "item_name": row.get("item_name"),
+                "current_stock": current_stock,
+                "average_consumption_per_week": average_consumption,
+                "weeks_to_order_for": stock_wanted_weeks,
+                "required_stock": required_stock,
+                "calculated_order_quantity": order_qty
+            })
 
-        # Create stock mapping
-        stock_map = {}
-        for entry in stock_data:
-            key = (entry.item_code, entry.warehouse)
-            stock_map[key] = flt(entry.qty)
+        return result
 
-        result = []
-        for item in items:
-            # Ensure we have proper item name fallback
-            item_name = item.item_name or item.name
-            
-            row = {
-                "item": item.name,  # This is the item code
-                "item_name": item_name,  # This is the display name
-                "item_code": item.name,  # Explicit item code
-                "tima_1": 0.0,
-                "tima_2": 0.0,
-                "tima_3": 0.0,
-                "tima_4": 0.0,
-                "tima_5": 0.0,
-                "tima_6": 0.0,
-                "tima_7": 0.0,
-                "jangwani": 0.0
-            }
+    except Exception as e:
+        frappe.log_error(f"Net Order Quantity Error: {str(e)}", "calculate_net_order_quantities")
+        return {"error": str(e)}
 
-            # Populate warehouse-specific stock
-            for warehouse, field in WAREHOUSE_MAP.items():
-                key = (item.name, warehouse)
-                row[field] = flt(stock_map.get(key, 0), 2)
+@frappe.whitelist()
+@instrumented
+def get_warehouse_specific_stock():
+    try:
+        result = get_stock_matrix("Fertilizer")
 
-            # Calculate total stock
-            row["total_stock"] = flt(sum(row[field] for field in WAREHOUSE_MAP.values()), 2)
-            result.append(row)
+        if not result:
+            frappe.log_error("No fertilizer items found", "Stock Error")
+            return {"error": "No fertilizer items found in the system"}
 
         return result
 
@@ -144,6 +118,7 @@ def get_warehouse_specific_stock():
         return {"error": str(e)}
 
 @frappe.whitelist()
+@instrumented
 def get_all_fertilizers():
     try:
         items = frappe.get_all("Item",
@@ -171,6 +146,7 @@ def get_all_fertilizers():
         return {"error": str(e)}
 
 @frappe.whitelist()
+@instrumented
 def debug_fertilizer_data():
     try:
         items = frappe.db.sql("""
@@ -209,27 +185,19 @@ def debug_fertilizer_data():
         return {"error": str(e)}
 
 @frappe.whitelist()
+@instrumented
 def validate_fertilizer_setup():
     try:
-        warehouse_list = [
-            'Fertilizer Store -T1 - T',
-            'Fertilizer Store -T2 - T', 
-            'Fertilizer Store -T3 - T',
-            'Fertilizer Store -T4 - T',
-            'Fertilizer Store -T5 - T',
-            'Fertilizer Store -T6 - T',
-            'Fertilizer Store -T7 - T',
-            'Jangwani Stores - TFL'
-        ]
+        warehouse_map = get_farm_warehouse_map("Fertilizer")
         
-        existing_warehouses = []
+        existing_warehouses = list(warehouse_map.keys())
         missing_warehouses = []
         
-        for warehouse in warehouse_list:
-            if frappe.db.exists("Warehouse", warehouse):
-                existing_warehouses.append(warehouse)
-            else:
-                missing_warehouses.append(warehouse)
+        # Farms without a Fertilizer store cannot report stock
+        stocked_fields = set(warehouse_map.values())
+        for farm in get_farm_registry().values():
+            if farm["fieldname"] not in stocked_fields:
+                missing_warehouses.append(_("{0} (no warehouse set as its Fertilizer store)").format(farm["farm"]))
         
         # Also check for fertilizer items
         fertilizer_count = frappe.db.count("Item", {"item_group": "Fertilizer", "disabled": 0})
@@ -245,6 +213,7 @@ def validate_fertilizer_setup():
         return {"error": str(e)}
 
 @frappe.whitelist()
+@instrumented
 def cleanup_consumption_table(docname):
     """Clean up consumption table by removing rows with missing item names"""
     try:
@@ -57,6 +57,7 @@ frappe.ui.form.on('Ordering Sheet', {
                 frm.refresh_field("table_bvnr");
                 frm.refresh_field("daily_minimum_consumption");
                 frm.refresh_field("daily_maximum_consumption");
+                frm.refresh_field("daily_p90_consumption");
             }).catch(err => {
                 console.error("Error fetching consumption data:", err);
                 frappe.msgprint(__("Error fetching consumption data. Please check console for details."));
@@ -96,11 +97,13 @@ function fetch_consumption_data(frm, item_codes) {
                 if (r.message) {
                     console.log("Consumption data received:", r.message);
 
-                    process_consumption_data(frm, r.message.average, "table_bvnr", "avg");
-                    process_consumption_data(frm, r.message.minimum, "daily_minimum_consumption", "minimum");
-                    process_consumption_data(frm, r.message.maximum, "daily_maximum_consumption", "maximum");
-
-                    resolve();
+                    get_consumption_columns().then(columns => {
+                        process_consumption_data(frm, r.message.average, columns['Average Consumption']);
+                        process_consumption_data(frm, r.message.minimum, columns['Minimum Consumption']);
+                        process_consumption_data(frm, r.message.maximum, columns['Maximum Consumption']);
+                        process_consumption_data(frm, r.message.p90, columns['P90 Consumption']);
+                        resolve();
+                    }).catch(reject);
                 } else {
                     console.log("No data returned");
                     resolve();
@@ -110,9 +113,27 @@ function fetch_consumption_data(frm, item_codes) {
     });
 }
 
-function process_consumption_data(frm, data, table_field, data_type) {
+// {calculation base: {table, farms: {farm: source column}, fields: {source column: order column}}},
+// built from the farm registry on the server
+let consumption_columns = null;
+
+function get_consumption_columns() {
+    if (consumption_columns) {
+        return Promise.resolve(consumption_columns);
+    }
+    return frappe.xcall('upande_timaflor.upande_timaflor.doctype.ordering_sheet.ordering_sheet.get_consumption_columns')
+        .then(columns => {
+            consumption_columns = columns;
+            return columns;
+        });
+}
+
+function process_consumption_data(frm, data, source) {
+    const table_field = source.table;
+    const fieldMap = source.farms;
+
     if (!data) {
-        console.log(`No ${data_type} data provided`);
+        console.log(`No ${table_field} data provided`);
         return;
     }
 
@@ -121,40 +142,7 @@ function process_consumption_data(frm, data, table_field, data_type) {
         frm.doc[table_field] = [];
     }
 
-    console.log(`Processing ${data_type} data for ${table_field}`, data);
-
-    const fieldMap = {
-        "avg": {
-            "Tima1": "t1_avg",
-            "Tima2": "t2_avg",
-            "Tima3": "t3_avg",
-            "Tima4": "t4_avg",
-            "Tima5": "t5_avg",
-            "Tima6": "t6_avg",
-            "Tima7": "t7_avg",
-            "Jangwani": "jangwani_avg"
-        },
-        "minimum": {
-            "Tima1": "tima_1_minimum",
-            "Tima2": "tima_2_minimum",
-            "Tima3": "tima_3_minimum",
-            "Tima4": "tima_4_minimum",
-            "Tima5": "tima_5_minimum",
-            "Tima6": "tima_6_minimum",
-            "Tima7": "tima_7_minimum",
-            "Jangwani": "jangwani_minimum"
-        },
-        "maximum": {
-            "Tima1": "tima_1_daily_avg",
-            "Tima2": "tima_2_daily_avg",
-            "Tima3": "tima_3_daily_avg",
-            "Tima4": "tima_4_daily_avg",
-            "Tima5": "tima_5_daily_avg",
-            "Tima6": "tima_6_daily_avg",
-            "Tima7": "tima_7_daily_avg",
-            "Jangwani": "jangwani_daily_avg"
-        }
-    };
+    console.log(`Processing data for ${table_field}`, data);
 
     frm.doc[table_field] = [];
 
@@ -163,12 +151,12 @@ function process_consumption_data(frm, data, table_field, data_type) {
         const row = frappe.model.add_child(frm.doc, table_field.charAt(0).toUpperCase() + table_field.slice(1), table_field);
         row.item = item_code;
 
-        Object.values(fieldMap[data_type]).forEach(field => {
+        Object.values(fieldMap).forEach(field => {
             row[field] = 0;
         });
 
         Object.entries(farm_data).forEach(([farm, value]) => {
-            const field = fieldMap[data_type][farm];
+            const field = fieldMap[farm];
             if (field) {
                 const safeValue = parseFloat(value) || 0;
                 row[field] = isNaN(safeValue) || !isFinite(safeValue) ? 0 : safeValue;
@@ -199,6 +187,15 @@ function show_supplier_dialog(frm) {
 
 function create_po(frm, supplier) {
     frappe.confirm(__('Create Purchase Order from this sheet?'), () => {
+        if (is_large_sheet(frm)) {
+            run_in_background(frm, 'create_purchase_order', {
+                supplier: supplier || frm.doc.supplier
+            }, (po_name) => {
+                frappe.set_route('Form', 'Purchase Order', po_name);
+            });
+            return;
+        }
+
         frm.call('create_purchase_order', {
             supplier: supplier || frm.doc.supplier
         }).then((r) => {
@@ -255,6 +252,13 @@ function proceedWithRFQCreation(frm) {
 }
 
 function createRFQFromSubmittedDoc(frm) {
+    if (is_large_sheet(frm)) {
+        run_in_background(frm, 'create_rfq', {}, (rfq_name) => {
+            frappe.set_route('Form', 'Request for Quotation', rfq_name);
+        });
+        return;
+    }
+
     frappe.call({
         method: 'upande_timaflor.upande_timaflor.doctype.ordering_sheet.ordering_sheet.create_rfq',
         args: {
@@ -288,7 +292,7 @@ function calculate_order_quantities(frm) {
             label: __('Base Calculation On'),
             fieldname: 'calculation_base',
             fieldtype: 'Select',
-            options: 'Average Consumption\nMinimum Consumption\nMaximum Consumption\nCustom Values',
+            options: 'Average Consumption\nMinimum Consumption\nMaximum Consumption\nP90 Consumption\nForecast Demand\nCustom Values',
             default: 'Average Consumption',
             reqd: 1
         }],
@@ -304,89 +308,75 @@ function calculate_order_quantities(frm) {
                 return;
             }
             
+            // Net requirements need stock and open POs from the server
+            if (frm.doc.net_requirement && values.calculation_base !== 'Custom Values') {
+                calculate_on_server(frm, values.calculation_base);
+                return;
+            }
+
             // For draft documents, continue with client-side update
             frm.doc.order_quantity = [];
 
-            let source_table, field_map;
-
             switch(values.calculation_base) {
-                case 'Average Consumption':
-                    source_table = frm.doc.table_bvnr;
-                    field_map = {
-                        't1_avg': 'tima_1',
-                        't2_avg': 'tima_2',
-                        't3_avg': 'tima_3',
-                        't4_avg': 'tima_4',
-                        't5_avg': 'tima_5',
-                        't6_avg': 'tima_6',
-                        't7_avg': 'tima_7',
-                        'jangwani_avg': 'jangwani'
-                    };
-                    break;
-                case 'Minimum Consumption':
-                    source_table = frm.doc.daily_minimum_consumption;
-                    field_map = {
-                        'tima_1_minimum': 'tima_1',
-                        'tima_2_minimum': 'tima_2',
-                        'tima_3_minimum': 'tima_3',
-                        'tima_4_minimum': 'tima_4',
-                        'tima_5_minimum': 'tima_5',
-                        'tima_6_minimum': 'tima_6',
-                        'tima_7_minimum': 'tima_7',
-                        'jangwani_minimum': 'jangwani'
-                    };
-                    break;
-                case 'Maximum Consumption':
-                    source_table = frm.doc.daily_maximum_consumption;
-                    field_map = {
-                        'tima_1_daily_avg': 'tima_1',
-                        'tima_2_daily_avg': 'tima_2',
-                        'tima_3_daily_avg': 'tima_3',
-                        'tima_4_daily_avg': 'tima_4',
-                        'tima_5_daily_avg': 'tima_5',
-                        'tima_6_daily_avg': 'tima_6',
-                        'tima_7_daily_avg': 'tima_7',
-                        'jangwani_daily_avg': 'jangwani'
-                    };
-                    break;
+                case 'Forecast Demand':
+                    calculate_on_server(frm, values.calculation_base);
+                    return;
                 case 'Custom Values':
                     show_custom_values_dialog(frm);
                     return;
             }
 
-            if (source_table && source_table.length > 0) {
-                source_table.forEach(source_row => {
-                    let order_row = frappe.model.add_child(frm.doc, "Order Quantity", "order_quantity");
-                    order_row.item = source_row.item;
-
-                    Object.entries(field_map).forEach(([source_field, target_field]) => {
-                        const baseValue = source_row[source_field] || 0;
-                        const calculatedValue = baseValue * frm.doc.ordering_quantity;
-                        order_row[target_field] = isNaN(calculatedValue) || !isFinite(calculatedValue) ? 0 : calculatedValue;
-                    });
-                });
-
-                frm.refresh_field("order_quantity");
-                
-                // Save without submit
-                frm.save().then(() => {
-                    frappe.show_alert({
-                        message: __('Order quantities calculated and saved based on ' + values.calculation_base),
-                        indicator: 'green'
-                    });
-                }).catch(err => {
-                    frappe.msgprint(__("Error saving calculated quantities: " + (err.message || err)));
-                });
-            } else {
-                frappe.msgprint(__('No source data found for ' + values.calculation_base));
-            }
+            get_consumption_columns().then(columns => {
+                const source = columns[values.calculation_base];
+                fill_order_quantities(frm, frm.doc[source.table], source.fields, values.calculation_base);
+            });
         }
     });
     dialog.show();
 }
 
+// Draft sheets: order quantity = daily figure x ordering quantity, per farm column
+function fill_order_quantities(frm, source_table, field_map, calculation_base) {
+    if (source_table && source_table.length > 0) {
+        source_table.forEach(source_row => {
+            let order_row = frappe.model.add_child(frm.doc, "Order Quantity", "order_quantity");
+            order_row.item = source_row.item;
+
+            Object.entries(field_map).forEach(([source_field, target_field]) => {
+                const baseValue = source_row[source_field] || 0;
+                const calculatedValue = baseValue * frm.doc.ordering_quantity;
+                order_row[target_field] = isNaN(calculatedValue) || !isFinite(calculatedValue) ? 0 : calculatedValue;
+            });
+        });
+
+        frm.refresh_field("order_quantity");
+
+        // Save without submit
+        frm.save().then(() => {
+            frappe.show_alert({
+                message: __('Order quantities calculated and saved based on ' + calculation_base),
+                indicator: 'green'
+            });
+        }).catch(err => {
+            frappe.msgprint(__("Error saving calculated quantities: " + (err.message || err)));
+        });
+    } else {
+        frappe.msgprint(__('No source data found for ' + calculation_base));
+    }
+}
+
 // New function to update order quantities via server method for submitted documents
 function update_order_quantities_server(frm, calculation_base) {
+    if (is_large_sheet(frm)) {
+        run_in_background(frm, 'calculate_order_quantities', {
+            calculation_base: calculation_base,
+            ordering_quantity: frm.doc.ordering_quantity
+        }, () => {
+            frm.reload_doc();
+        });
+        return;
+    }
+
     frappe.call({
         method: 'upande_timaflor.upande_timaflor.doctype.ordering_sheet.ordering_sheet.update_order_quantities',
         args: {
@@ -415,6 +405,40 @@ function update_order_quantities_server(frm, calculation_base) {
     });
 }
 
+// Forecasts and net requirements are computed on the server, so drafts are saved first
+function calculate_on_server(frm, calculation_base) {
+    const run = () => {
+        if (is_large_sheet(frm)) {
+            run_in_background(frm, 'calculate_order_quantities', {
+                calculation_base: calculation_base,
+                ordering_quantity: frm.doc.ordering_quantity
+            }, () => {
+                frm.reload_doc();
+            });
+            return;
+        }
+
+        frm.call({
+            method: 'calculate_order_quantities',
+            doc: frm.doc,
+            args: {
+                calculation_base: calculation_base,
+                ordering_quantity: frm.doc.ordering_quantity
+            },
+            freeze: true,
+            freeze_message: __('Calculating Order Quantities...')
+        }).then(() => {
+            frm.reload_doc();
+            frappe.show_alert({
+                message: __('Order quantities calculated based on ' + calculation_base),
+                indicator: 'green'
+            });
+        });
+    };
+
+    frm.is_dirty() || frm.is_new() ? frm.save().then(run) : run();
+}
+
 function show_custom_values_dialog(frm) {
     let items = [];
 
@@ -431,18 +455,12 @@ function show_custom_values_dialog(frm) {
         return;
     }
 
+    const farm_columns = frappe.boot.farm_columns || [];
     const dialog = new frappe.ui.Dialog({
         title: __('Enter Custom Order Values'),
         fields: [
             { label: __('Item'), fieldname: 'item', fieldtype: 'Select', options: items, reqd: 1 },
-            { label: __('TIMA 1'), fieldname: 'tima_1', fieldtype: 'Float', default: 0 },
-            { label: __('TIMA 2'), fieldname: 'tima_2', fieldtype: 'Float', default: 0 },
-            { label: __('TIMA 3'), fieldname: 'tima_3', fieldtype: 'Float', default: 0 },
-            { label: __('TIMA 4'), fieldname: 'tima_4', fieldtype: 'Float', default: 0 },
-            { label: __('TIMA 5'), fieldname: 'tima_5', fieldtype: 'Float', default: 0 },
-            { label: __('TIMA 6'), fieldname: 'tima_6', fieldtype: 'Float', default: 0 },
-            { label: __('TIMA 7'), fieldname: 'tima_7', fieldtype: 'Float', default: 0 },
-            { label: __('Jangwani'), fieldname: 'jangwani', fieldtype: 'Float', default: 0 }
+            ...farm_columns.map(({ farm, fieldname }) => ({ label: farm, fieldname: fieldname, fieldtype: 'Float', default: 0 }))
         ],
         primary_action: function(values) {
             const wasSubmitted = frm.doc.docstatus === 1;
@@ -474,25 +492,13 @@ function show_custom_values_dialog(frm) {
                 // For draft documents
                 let order_row = frappe.model.add_child(frm.doc, "Order Quantity", "order_quantity");
                 order_row.item = values.item;
-                order_row.tima_1 = values.tima_1;
-                order_row.tima_2 = values.tima_2;
-                order_row.tima_3 = values.tima_3;
-                order_row.tima_4 = values.tima_4;
-                order_row.tima_5 = values.tima_5;
-                order_row.tima_6 = values.tima_6;
-                order_row.tima_7 = values.tima_7;
-                order_row.jangwani = values.jangwani;
+                farm_columns.forEach(({ fieldname }) => {
+                    order_row[fieldname] = values[fieldname];
+                });
 
                 frm.refresh_field("order_quantity");
 
-                dialog.fields_dict.tima_1.set_value(0);
-                dialog.fields_dict.tima_2.set_value(0);
-                dialog.fields_dict.tima_3.set_value(0);
-                dialog.fields_dict.tima_4.set_value(0);
-                dialog.fields_dict.tima_5.set_value(0);
-                dialog.fields_dict.tima_6.set_value(0);
-                dialog.fields_dict.tima_7.set_value(0);
-                dialog.fields_dict.jangwani.set_value(0);
+                farm_columns.forEach(({ fieldname }) => dialog.fields_dict[fieldname].set_value(0));
 
                 frappe.show_alert({
                     message: __('Item added to Order Quantity'),
@@ -503,4 +509,53 @@ function show_custom_values_dialog(frm) {
     });
 
     dialog.show();
-}
\ No newline at end of file
+}
+
+// Sheets with more rows than this run heavy actions on the background queue
+const BACKGROUND_ROW_THRESHOLD = 150;
+
+function is_large_sheet(frm) {
+    const rows = Math.max(
+        (frm.doc.order_quantity || []).length,
+        (frm.doc.table_bvnr || []).length
+    );
+    return rows > BACKGROUND_ROW_THRESHOLD;
+}
+
+function run_in_background(frm, action, args, on_complete) {
+    const handler = (data) => {
+        if (data.doc_name !== frm.doc.name || data.action !== action) return;
+
+        if (data.status === 'running') {
+            frappe.show_alert({ message: __('Processing {0}...', [frm.doc.name]), indicator: 'blue' });
+        } else if (data.status === 'completed') {
+            frappe.realtime.off('ordering_sheet_job', handler);
+            frappe.show_alert({ message: __('Background job completed'), indicator: 'green' });
+            on_complete && on_complete(data.result);
+        } else if (data.status === 'failed') {
+            frappe.realtime.off('ordering_sheet_job', handler);
+            frappe.msgprint(__('Background job failed: {0}', [data.error]));
+        }
+    };
+
+    frappe.realtime.on('ordering_sheet_job', handler);
+
+    frappe.call({
+        method: 'upande_timaflor.upande_timaflor.doctype.ordering_sheet.ordering_sheet.enqueue_ordering_sheet_action',
+        args: {
+            doc_name: frm.doc.name,
+            action: action,
+            args: args
+        },
+        callback: function(r) {
+            if (r.exc) {
+                frappe.realtime.off('ordering_sheet_job', handler);
+                return;
+            }
+            frappe.show_alert({
+                message: __('Large sheet: queued in the background. You will be notified when it completes.'),
+                indicator: 'orange'
+            });
+        }
+    });
+}
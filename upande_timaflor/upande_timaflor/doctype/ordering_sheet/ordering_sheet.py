@@ -4,9 +4,20 @@ from frappe.model.document import Document
 from datetime import datetime
 from frappe import _
 import json
+import re
+from upande_timaflor.bulk import insert_child_rows, replace_child_rows
+from upande_timaflor.consumption import DEFAULT_SERVICE_LEVEL, DailySeriesStats, empty_summary, forecast_demand
+from upande_timaflor.farms import get_farm_fields, get_farm_registry, get_farm_total, get_farms
+from upande_timaflor.items import get_item_details_map
+from upande_timaflor.instrumentation import instrumented
+from upande_timaflor.requirements import get_net_requirements
+from upande_timaflor.upande_timaflor.doctype.farm_daily_consumption.farm_daily_consumption import (
+    get_daily_farm_consumption
+)
 
 class OrderingSheet(Document):
     @frappe.whitelist()
+    @instrumented
     def create_purchase_order(self, supplier=None):
         """Create Purchase Order from Ordering Sheet"""
         if not self.order_quantity:
@@ -20,31 +31,16 @@ class OrderingSheet(Document):
         po.supplier = final_supplier
         po.company = frappe.defaults.get_user_default("Company")
         
-        for order_item in self.order_quantity:
-            total_qty = sum([
-                order_item.tima_1 or 0,
-                order_item.tima_2 or 0,
-                order_item.tima_3 or 0,
-                order_item.tima_4 or 0,
-                order_item.tima_5 or 0,
-                order_item.tima_6 or 0,
-                order_item.tima_7 or 0,
-                order_item.jangwani or 0  
-            ])
-
-            if total_qty > 0:
-                # Get item details including stock_uom
-                item_details = frappe.db.get_value("Item", order_item.item, 
-                    ["item_name", "description", "stock_uom"], as_dict=1)
-                
-                po.append("items", {
-                    "item_code": order_item.item,
-                    "qty": total_qty,
-                    "schedule_date": frappe.utils.nowdate(),
-                    "conversion_factor": 1.0,  
-                    "uom": item_details.stock_uom if item_details else "Nos",
-                    "stock_uom": item_details.stock_uom if item_details else "Nos"
-                })
+        schedule_date = frappe.utils.nowdate()
+        for order_item, total_qty, item_details in get_order_lines(self.order_quantity):
+            po.append("items", {
+                "item_code": order_item.item,
+                "qty": total_qty,
+                "schedule_date": schedule_date,
+                "conversion_factor": 1.0,  
+                "uom": item_details.stock_uom if item_details else "Nos",
+                "stock_uom": item_details.stock_uom if item_details else "Nos"
+            })
 
         if not po.get("items"):
             frappe.throw(_("No items with positive quantities found"))
@@ -55,6 +51,7 @@ class OrderingSheet(Document):
         return po.name
         
     @frappe.whitelist()
+    @instrumented
     def calculate_order_quantities(self, calculation_base, ordering_quantity):
         """Calculate order quantities based on consumption data"""
         if not calculation_base or not ordering_quantity:
@@ -63,67 +60,15 @@ class OrderingSheet(Document):
         # Clear current order quantities
         self.order_quantity = []
         
-        # Get source data based on calculation base
-        source_table = None
-        field_map = {}
-        
-        if calculation_base == 'Average Consumption':
-            source_table = self.table_bvnr
-            field_map = {
-                't1_avg': 'tima_1',
-                't2_avg': 'tima_2',
-                't3_avg': 'tima_3',
-                't4_avg': 'tima_4',
-                't5_avg': 'tima_5',
-                't6_avg': 'tima_6',
-                't7_avg': 'tima_7',
-                'jangwani_avg': 'jangwani'
-            }
-        elif calculation_base == 'Minimum Consumption':
-            source_table = self.daily_minimum_consumption
-            field_map = {
-                'tima_1_minimum': 'tima_1',
-                'tima_2_minimum': 'tima_2',
-                'tima_3_minimum': 'tima_3',
-                'tima_4_minimum': 'tima_4',
-                'tima_5_minimum': 'tima_5',
-                'tima_6_minimum': 'tima_6',
-                'tima_7_minimum': 'tima_7',
-                'jangwani_minimum': 'jangwani'
-            }
-        elif calculation_base == 'Maximum Consumption':
-            source_table = self.daily_maximum_consumption
-            field_map = {
-                'tima_1_daily_avg': 'tima_1',
-                'tima_2_daily_avg': 'tima_2',
-                'tima_3_daily_avg': 'tima_3',
-                'tima_4_daily_avg': 'tima_4',
-                'tima_5_daily_avg': 'tima_5',
-                'tima_6_daily_avg': 'tima_6',
-                'tima_7_daily_avg': 'tima_7',
-                'jangwani_daily_avg': 'jangwani'
-            }
-        else:
-            frappe.throw(_("Invalid calculation base selected"))
-        
-        # Calculate new order quantities
-        if source_table and len(source_table) > 0:
-            ordering_qty = float(ordering_quantity)
-            
-            for source_row in source_table:
-                order_row = self.append("order_quantity", {})
-                order_row.item = source_row.item
-                
-                for source_field, target_field in field_map.items():
-                    base_value = float(source_row.get(source_field) or 0)
-                    calculated_value = base_value * ordering_qty
-                    order_row.set(target_field, calculated_value)
+        for order_row in get_order_rows(self, calculation_base, ordering_quantity):
+            self.append("order_quantity", order_row)
                     
         # Save but don't submit
         self.save()
         return self.name
 
 @frappe.whitelist()
+@instrumented
 def get_average_consumption(item_code, from_date, to_date):
     """Calculate average daily consumption per farm"""
     from_date = datetime.strptime(from_date, "%Y-%m-%d")
@@ -134,20 +79,20 @@ def get_average_consumption(item_code, from_date, to_date):
 
     stock_movement = frappe.db.sql("""
         SELECT 
-            w.farm AS farm,
-            SUM(sle.actual_qty) AS total_qty
-        FROM `tabStock Ledger Entry` sle
-        LEFT JOIN `tabWarehouse` w ON sle.warehouse = w.name
+            farm,
+            SUM(actual_qty) AS total_qty
+        FROM `tabFarm Daily Consumption`
         WHERE 
-            sle.item_code = %s 
-            AND sle.posting_date BETWEEN %s AND %s
-            AND w.farm IS NOT NULL
-        GROUP BY w.farm
+            item_code = %s 
+            AND posting_date BETWEEN %s AND %s
+            AND farm != ''
+        GROUP BY farm
     """, (item_code, from_date.strftime("%Y-%m-%d"), to_date.strftime("%Y-%m-%d")), as_dict=True)
 
     return {entry.farm: (entry.total_qty or 0)/days for entry in stock_movement if days}
 
 @frappe.whitelist()
+@instrumented
 def get_all_consumption_data(item_codes, from_date, to_date):
     try:
         if isinstance(item_codes, str):
@@ -158,60 +103,50 @@ def get_all_consumption_data(item_codes, from_date, to_date):
         days = (to_date_obj - from_date_obj).days
         
         if days <= 0: 
-            return {"average": {}, "minimum": {}, "maximum": {}}
-        
-        result = {"average": {}, "minimum": {}, "maximum": {}}
+            return {key: {} for key in CONSUMPTION_STATISTICS}
         
+        # BETWEEN is inclusive, so the window spans days + 1 calendar days; days
+        # without any movement count as zero consumption
+        window_days = days + 1
+        all_farms = get_farms()
+
+        # Net movement for the averages and extremes; percentiles describe the
+        # consumption tail, so they come from outgoing qty as a positive magnitude
+        net_stats = get_daily_series_stats(item_codes, from_date, to_date, window_days, "actual_qty")
+        consumed_stats = get_daily_series_stats(item_codes, from_date, to_date, window_days, "consumed_qty", sign=-1)
+
+        result = {key: {} for key in CONSUMPTION_STATISTICS}
         for item_code in item_codes:
-            result["average"][item_code] = {}
-            result["minimum"][item_code] = {}
-            result["maximum"][item_code] = {}
-            
-            stock_data = frappe.db.sql("""
-                SELECT 
-                    w.farm AS farm,
-                    DATE(sle.posting_date) AS posting_date,
-                    SUM(sle.actual_qty) AS daily_qty
-                FROM `tabStock Ledger Entry` sle
-                LEFT JOIN `tabWarehouse` w ON sle.warehouse = w.name
-                WHERE 
-                    sle.item_code = %s 
-                    AND sle.posting_date BETWEEN %s AND %s
-                    AND w.farm IS NOT NULL
-                GROUP BY w.farm, DATE(sle.posting_date)
-            """, (item_code, from_date, to_date), as_dict=True)
-            
-            farm_daily_data = {}
-            for entry in stock_data:
-                farm = entry.farm
-                if farm not in farm_daily_data:
-                    farm_daily_data[farm] = []
-                if entry.daily_qty is not None:
-                    farm_daily_data[farm].append(float(entry.daily_qty))
-            
-            for farm, daily_values in farm_daily_data.items():
-                if daily_values:
-                    result["average"][item_code][farm] = sum(daily_values) / len(daily_values)
-                    result["minimum"][item_code][farm] = min(daily_values)
-                    result["maximum"][item_code][farm] = max(daily_values)
-                else:
-                    result["average"][item_code][farm] = 0
-                    result["minimum"][item_code][farm] = 0
-                    result["maximum"][item_code][farm] = 0
-            
-            all_farms = ["Tima1", "Tima2", "Tima3", "Tima4", "Tima5", "Tima6", "Tima7", "Jangwani"]
-            for farm in all_farms:
-                if farm not in farm_daily_data:
-                    result["average"][item_code][farm] = 0
-                    result["minimum"][item_code][farm] = 0
-                    result["maximum"][item_code][farm] = 0
+            summaries = get_farm_summaries(net_stats.get(item_code, {}), all_farms)
+            consumed_summaries = get_farm_summaries(consumed_stats.get(item_code, {}), all_farms)
+
+            for key, stat in CONSUMPTION_STATISTICS.items():
+                source = consumed_summaries if stat in CONSUMED_STATISTICS else summaries
+                result[key][item_code] = {farm: summary[stat] for farm, summary in source.items()}
         
         return result
     except Exception as e:
         frappe.log_error(f"Error in get_all_consumption_data: {str(e)}", "Consumption Data Error")
         raise
 
+def get_daily_series_stats(item_codes, from_date, to_date, window_days, qty_field, sign=1):
+    """{item_code: {farm: DailySeriesStats}} over a window from the daily rollup"""
+    stats = {}
+    for entry in get_daily_farm_consumption(item_codes, from_date, to_date, qty_field=qty_field):
+        farm_stats = stats.setdefault(entry.item_code, {})
+        if entry.farm not in farm_stats:
+            farm_stats[entry.farm] = DailySeriesStats(window_days)
+        farm_stats[entry.farm].add(sign * float(entry.daily_qty or 0))
+    return stats
+
+def get_farm_summaries(farm_stats, all_farms):
+    summaries = {farm: series.summary() for farm, series in farm_stats.items()}
+    for farm in all_farms:
+        summaries.setdefault(farm, empty_summary())
+    return summaries
+
 @frappe.whitelist()
+@instrumented
 def create_rfq(ordering_sheet):
     """Create RFQ without suppliers/message"""
     if not ordering_sheet:
@@ -231,33 +166,20 @@ def create_rfq(ordering_sheet):
     rfq.company = frappe.defaults.get_user_default("Company")
     rfq.ordering_sheet = ordering_sheet
     
+    default_warehouse = frappe.db.get_single_value("Stock Settings", "default_warehouse") or ""
+
     # Add items 
-    for order_item in doc.order_quantity:
-        total_qty = sum([
-            order_item.tima_1 or 0,
-            order_item.tima_2 or 0,
-            order_item.tima_3 or 0,
-            order_item.tima_4 or 0,
-            order_item.tima_5 or 0,
-            order_item.tima_6 or 0,
-            order_item.tima_7 or 0,
-            order_item.jangwani or 0  
-        ])
-        
-        if total_qty > 0:
-            item_details = frappe.db.get_value("Item", order_item.item, 
-                ["item_name", "description", "stock_uom"], as_dict=1)
-            
-            rfq.append("items", {
-                "item_code": order_item.item,
-                "qty": total_qty,
-                "item_name": item_details.item_name if item_details else "",
-                "description": item_details.description if item_details else "",
-                "uom": item_details.stock_uom if item_details else "Nos",
-                "conversion_factor": 1.0,  
-                "stock_uom": item_details.stock_uom if item_details else "Nos",  
-                "warehouse": frappe.db.get_single_value("Stock Settings", "default_warehouse") or ""
-            })
+    for order_item, total_qty, item_details in get_order_lines(doc.order_quantity):
+        rfq.append("items", {
+            "item_code": order_item.item,
+            "qty": total_qty,
+            "item_name": item_details.item_name if item_details else "",
+            "description": item_details.description if item_details else "",
+            "uom": item_details.stock_uom if item_details else "Nos",
+            "conversion_factor": 1.0,  
+            "stock_uom": item_details.stock_uom if item_details else "Nos",  
+            "warehouse": default_warehouse
+        })
     
     # Insert as draft without validations
     rfq.insert(ignore_permissions=True, ignore_mandatory=True)
@@ -268,6 +190,7 @@ def create_rfq(ordering_sheet):
     return rfq.name
 
 @frappe.whitelist()
+@instrumented
 def get_items_for_rfq(ordering_sheet):
     if not ordering_sheet:
         frappe.throw(_("Ordering Sheet is required"))
@@ -277,34 +200,150 @@ def get_items_for_rfq(ordering_sheet):
         frappe.throw(_("No order quantities found - please calculate order quantities first"))
     
     items = []
-    for order_item in doc.order_quantity:
-        total_qty = sum([
-            order_item.tima_1 or 0,
-            order_item.tima_2 or 0,
-            order_item.tima_3 or 0,
-            order_item.tima_4 or 0,
-            order_item.tima_5 or 0,
-            order_item.tima_6 or 0,
-            order_item.tima_7 or 0,
-            order_item.jangwani or 0  
-        ])
-        
-        if total_qty > 0:
-            item_details = frappe.db.get_value("Item", order_item.item, 
-                ["item_name", "description", "stock_uom"], as_dict=1)
-            
-            items.append({
-                "item": order_item.item,
-                "total_qty": total_qty,
-                "item_name": item_details.item_name if item_details else "",
-                "description": item_details.description if item_details else "",
-                "uom": item_details.stock_uom if item_details else "Nos"
-            })
+    for order_item, total_qty, item_details in get_order_lines(doc.order_quantity):
+        items.append({
+            "item": order_item.item,
+            "total_qty": total_qty,
+            "item_name": item_details.item_name if item_details else "",
+            "description": item_details.description if item_details else "",
+            "uom": item_details.stock_uom if item_details else "Nos"
+        })
     
     return items
 
+def get_order_lines(order_quantity):
+    """Order rows with a positive total qty, paired with item details fetched in one query"""
+    lines = []
+    for order_item in order_quantity:
+        total_qty = get_farm_total(order_item)
+        if total_qty > 0:
+            lines.append((order_item, total_qty))
+
+    item_details = get_item_details_map([order_item.item for order_item, total_qty in lines])
+    return [(order_item, total_qty, item_details.get(order_item.item)) for order_item, total_qty in lines]
+
+# Payload key: statistic from the per-farm daily series summary
+CONSUMPTION_STATISTICS = {
+    "average": "average",
+    "minimum": "minimum",
+    "maximum": "maximum",
+    "p50": "p50",
+    "p90": "p90",
+    "p95": "p95",
+    "std_dev": "std_dev",
+    "total": "total"
+}
+
+# Statistics computed on consumption (outgoing qty, positive) rather than net movement
+CONSUMED_STATISTICS = ("p50", "p90", "p95")
+
+CONSUMPTION_SOURCES = {
+    # calculation base: (source table, source column for a farm's order quantity column)
+    'Average Consumption': ('table_bvnr', lambda field: re.sub(r"^tima_(\d+)$", r"t\1", field) + "_avg"),
+    'Minimum Consumption': ('daily_minimum_consumption', lambda field: field + "_minimum"),
+    'Maximum Consumption': ('daily_maximum_consumption', lambda field: field + "_daily_avg"),
+    'P90 Consumption': ('daily_p90_consumption', lambda field: field + "_p90")
+}
+
+def get_consumption_source(doc, calculation_base):
+    """Source rows and {source column: order quantity column} map for a calculation base"""
+    if calculation_base not in CONSUMPTION_SOURCES:
+        frappe.throw(_("Invalid calculation base selected"))
+
+    table_field, get_source_field = CONSUMPTION_SOURCES[calculation_base]
+    field_map = {get_source_field(field): field for field in get_farm_fields()}
+    return doc.get(table_field), field_map
+
+@frappe.whitelist()
+def get_consumption_columns():
+    """Per calculation base: its table, {farm: source column} and {source column: order column}"""
+    farms = list(get_farm_registry().values())
+    columns = {}
+    for calculation_base, (table_field, get_source_field) in CONSUMPTION_SOURCES.items():
+        source_fields = {farm["fieldname"]: get_source_field(farm["fieldname"]) for farm in farms}
+        columns[calculation_base] = {
+            "table": table_field,
+            "farms": {farm["farm"]: source_fields[farm["fieldname"]] for farm in farms},
+            "fields": {source: field for field, source in source_fields.items()}
+        }
+    return columns
+
+def get_order_rows(doc, calculation_base, ordering_quantity):
+    """Order Quantity rows for a calculation base: a daily figure per farm times the
+    ordering quantity (days), or the forecast demand plus safety stock over it.
+    With Net Requirement set, only the shortfall against available stock is ordered."""
+    order_rows = get_gross_order_rows(doc, calculation_base, float(ordering_quantity))
+    if doc.get("net_requirement"):
+        order_rows = get_net_requirements(order_rows)
+    return order_rows
+
+def get_gross_order_rows(doc, calculation_base, ordering_qty):
+    if calculation_base == FORECAST_BASE:
+        forecast = get_demand_forecast(doc, max(int(round(ordering_qty)), 1))
+        return [
+            {"item": item, **{field: f["demand"] + f["safety_stock"] for field, f in farms.items()}}
+            for item, farms in forecast.items()
+        ]
+
+    source_table, field_map = get_consumption_source(doc, calculation_base)
+    order_rows = []
+    for source_row in source_table or []:
+        order_row = {"item": source_row.item}
+        for source_field, target_field in field_map.items():
+            base_value = float(source_row.get(source_field) or 0)
+            order_row[target_field] = base_value * ordering_qty
+        order_rows.append(order_row)
+    return order_rows
+
+# Demand forecasting
+FORECAST_BASE = "Forecast Demand"
+FORECAST_HISTORY_DAYS = 90
+FORECAST_BATCH_SIZE = 200
+FORECAST_CACHE_TTL = 6 * 60 * 60
+
+def get_demand_forecast(doc, horizon, service_level=DEFAULT_SERVICE_LEVEL):
+    """Holt forecast per (item, farm) over `horizon` days, from the sheet's consumption window
+
+    Returns {item: {farm fieldname: {"demand", "safety_stock", "rmse", "alpha", "beta"}}}.
+    Results are cached per sheet until its items, window, horizon or the date change.
+    """
+    items = sorted({row.item for row in doc.get("table_bvnr") or [] if row.item})
+    history_days = int(doc.daily_average_consumptiondays or 0) or FORECAST_HISTORY_DAYS
+    signature = [items, history_days, horizon, service_level, frappe.utils.nowdate()]
+
+    cache_key = f"upande_timaflor:ordering_sheet_forecast:{doc.name}"
+    cached = frappe.cache().get_value(cache_key)
+    if cached and cached["signature"] == signature:
+        return cached["forecast"]
+
+    to_date = frappe.utils.getdate(frappe.utils.nowdate())
+    from_date = frappe.utils.add_days(to_date, -(history_days - 1))
+    farm_fields = {farm: entry["fieldname"] for farm, entry in get_farm_registry().items()}
+
+    forecast = {}
+    for i in range(0, len(items), FORECAST_BATCH_SIZE):
+        batch = items[i:i + FORECAST_BATCH_SIZE]
+
+        # Zero-filled daily consumption (positive) per item and farm column
+        series = {item: {field: [0.0] * history_days for field in farm_fields.values()} for item in batch}
+        for entry in get_daily_farm_consumption(batch, from_date, to_date, qty_field="consumed_qty"):
+            field = farm_fields.get(entry.farm)
+            if field:
+                day = (frappe.utils.getdate(entry.posting_date) - from_date).days
+                series[entry.item_code][field][day] -= float(entry.daily_qty or 0)
+
+        for item, farm_series in series.items():
+            forecast[item] = {
+                field: forecast_demand(values, horizon, service_level)
+                for field, values in farm_series.items()
+            }
+
+    frappe.cache().set_value(cache_key, {"signature": signature, "forecast": forecast}, expires_in_sec=FORECAST_CACHE_TTL)
+    return forecast
+
 # New methods to handle calculations for submitted documents
 @frappe.whitelist()
+@instrumented
 def update_order_quantities(doc_name, calculation_base, ordering_quantity):
     """Update order quantities for a submitted document"""
     if not doc_name:
@@ -315,96 +354,18 @@ def update_order_quantities(doc_name, calculation_base, ordering_quantity):
     if doc.docstatus != 1:
         frappe.throw(_("Document must be submitted to update via this method"))
     
-    # Use workflow that preserves submitted state
-    # Store original values
-    old_amended_from = doc.amended_from
-    old_docstatus = doc.docstatus
-    
-    # Clear order quantities
-    doc.order_quantity = []
-    
-    # Get source data based on calculation base
-    source_table = None
-    field_map = {}
-    
-    if calculation_base == 'Average Consumption':
-        source_table = doc.table_bvnr
-        field_map = {
-            't1_avg': 'tima_1',
-            't2_avg': 'tima_2',
-            't3_avg': 'tima_3',
-            't4_avg': 'tima_4',
-            't5_avg': 'tima_5',
-            't6_avg': 'tima_6',
-            't7_avg': 'tima_7',
-            'jangwani_avg': 'jangwani'
-        }
-    elif calculation_base == 'Minimum Consumption':
-        source_table = doc.daily_minimum_consumption
-        field_map = {
-            'tima_1_minimum': 'tima_1',
-            'tima_2_minimum': 'tima_2',
-            'tima_3_minimum': 'tima_3',
-            'tima_4_minimum': 'tima_4',
-            'tima_5_minimum': 'tima_5',
-            'tima_6_minimum': 'tima_6',
-            'tima_7_minimum': 'tima_7',
-            'jangwani_minimum': 'jangwani'
-        }
-    elif calculation_base == 'Maximum Consumption':
-        source_table = doc.daily_maximum_consumption
-        field_map = {
-            'tima_1_daily_avg': 'tima_1',
-            'tima_2_daily_avg': 'tima_2',
-            'tima_3_daily_avg': 'tima_3',
-            'tima_4_daily_avg': 'tima_4',
-            'tima_5_daily_avg': 'tima_5',
-            'tima_6_daily_avg': 'tima_6',
-            'tima_7_daily_avg': 'tima_7',
-            'jangwani_daily_avg': 'jangwani'
-        }
-    else:
-        frappe.throw(_("Invalid calculation base selected"))
-    
-    # Calculate new order quantities
-    if source_table and len(source_table) > 0:
-        ordering_qty = float(ordering_quantity)
-        
-        for source_row in source_table:
-            order_row = doc.append("order_quantity", {})
-            order_row.item = source_row.item
-            
-            for source_field, target_field in field_map.items():
-                base_value = float(source_row.get(source_field) or 0)
-                calculated_value = base_value * ordering_qty
-                order_row.set(target_field, calculated_value)
-    
-    # Use direct DB updates to maintain submitted state
-    frappe.db.set_value("Ordering Sheet", doc_name, {
-        "amended_from": old_amended_from,
-        "docstatus": old_docstatus
-    })
+    order_rows = get_order_rows(doc, calculation_base, ordering_quantity)
     
-    # Update the child table data
-    if doc.order_quantity:
-        # Delete existing order quantity items
-        frappe.db.sql("""
-            DELETE FROM `tabOrdering Sheet Item`
-            WHERE parent = %s
-        """, (doc_name,))
-        
-        # Insert new order quantity items
-        for i, item in enumerate(doc.order_quantity):
-            item.parent = doc_name
-            item.parenttype = "Ordering Sheet"
-            item.parentfield = "order_quantity"
-            item.idx = i + 1
-            item.insert()
+    # Write the child table directly to keep the document submitted
+    if order_rows:
+        replace_child_rows(doc, "order_quantity", order_rows)
+        doc.db_set("modified", frappe.utils.now(), update_modified=False)
     
     frappe.db.commit()
     return doc_name
 
 @frappe.whitelist()
+@instrumented
 def add_custom_order_quantity(doc_name, item_values):
     """Add custom order quantity to a submitted document"""
     if not doc_name:
@@ -419,27 +380,101 @@ def add_custom_order_quantity(doc_name, item_values):
         frappe.throw(_("Document must be submitted to update via this method"))
     
     # Use direct DB approach to maintain submitted state
-    # First get current order_quantity items
-    current_items = frappe.get_all("Ordering Sheet Item", 
-        filters={"parent": doc_name, "parentfield": "order_quantity"},
-        fields=["*"], order_by="idx")
-    
-    # Create new item
-    new_item = frappe.new_doc("Ordering Sheet Item")
-    new_item.parent = doc_name
-    new_item.parenttype = "Ordering Sheet"
-    new_item.parentfield = "order_quantity"
-    new_item.idx = len(current_items) + 1
-    new_item.item = item_values.get('item')
-    new_item.tima_1 = float(item_values.get('tima_1') or 0)
-    new_item.tima_2 = float(item_values.get('tima_2') or 0)
-    new_item.tima_3 = float(item_values.get('tima_3') or 0)
-    new_item.tima_4 = float(item_values.get('tima_4') or 0)
-    new_item.tima_5 = float(item_values.get('tima_5') or 0)
-    new_item.tima_6 = float(item_values.get('tima_6') or 0)
-    new_item.tima_7 = float(item_values.get('tima_7') or 0)
-    new_item.jangwani = float(item_values.get('jangwani') or 0)
-    new_item.insert()
+    new_item = {"item": item_values.get('item')}
+    for field in get_farm_fields():
+        new_item[field] = float(item_values.get(field) or 0)
+    insert_child_rows(doc, "order_quantity", [new_item])
     
     frappe.db.commit()
-    return doc_name
\ No newline at end of file
+    return doc_name
+# Background job mode for large sheets
+BACKGROUND_ACTIONS = ("calculate_order_quantities", "create_purchase_order", "create_rfq")
+JOB_RESULT_TTL = 60 * 60
+
+def get_ordering_sheet_job_id(doc_name, action):
+    """Idempotency key: one queued or running job per sheet and action"""
+    return f"ordering_sheet::{doc_name}::{action}"
+
+@frappe.whitelist()
+@instrumented
+def enqueue_ordering_sheet_action(doc_name, action, args=None):
+    """Run a heavy Ordering Sheet action on the long queue
+
+    Progress is published on the `ordering_sheet_job` realtime event; the form can
+    also poll get_ordering_sheet_job_status. Requests for an action that is already
+    queued or running return the existing job instead of starting another one.
+    """
+    from frappe.utils.background_jobs import is_job_enqueued
+
+    if action not in BACKGROUND_ACTIONS:
+        frappe.throw(_("Unsupported Ordering Sheet action: {0}").format(action))
+
+    if isinstance(args, str):
+        args = json.loads(args)
+
+    doc = frappe.get_doc("Ordering Sheet", doc_name)
+    doc.check_permission("write")
+
+    job_id = get_ordering_sheet_job_id(doc_name, action)
+    if is_job_enqueued(job_id):
+        return {"job_id": job_id, "status": "queued"}
+
+    frappe.cache().delete_value(f"{job_id}::result")
+    frappe.enqueue(
+        run_ordering_sheet_action,
+        queue="long",
+        timeout=1500,
+        job_id=job_id,
+        deduplicate=True,
+        enqueue_after_commit=True,
+        doc_name=doc_name,
+        action=action,
+        args=args or {}
+    )
+    publish_job_status(doc_name, action, "queued")
+    return {"job_id": job_id, "status": "queued"}
+
+def run_ordering_sheet_action(doc_name, action, args):
+    publish_job_status(doc_name, action, "running")
+    try:
+        doc = frappe.get_doc("Ordering Sheet", doc_name)
+        if action == "calculate_order_quantities":
+            if doc.docstatus == 1:
+                result = update_order_quantities(doc_name, args.get("calculation_base"), args.get("ordering_quantity"))
+            else:
+                result = doc.calculate_order_quantities(args.get("calculation_base"), args.get("ordering_quantity"))
+        elif action == "create_purchase_order":
+            result = doc.create_purchase_order(supplier=args.get("supplier"))
+        else:
+            result = create_rfq(doc_name)
+
+        frappe.db.commit()
+        publish_job_status(doc_name, action, "completed", result=result)
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(f"Ordering Sheet {action} failed for {doc_name}: {str(e)}", "Ordering Sheet Job Error")
+        publish_job_status(doc_name, action, "failed", error=str(e))
+
+def publish_job_status(doc_name, action, status, result=None, error=None):
+    message = {
+        "doc_name": doc_name,
+        "action": action,
+        "status": status,
+        "result": result,
+        "error": error
+    }
+    frappe.cache().set_value(
+        f"{get_ordering_sheet_job_id(doc_name, action)}::result", message, expires_in_sec=JOB_RESULT_TTL
+    )
+    frappe.publish_realtime("ordering_sheet_job", message, doctype="Ordering Sheet", docname=doc_name)
+
+@frappe.whitelist()
+@instrumented
+def get_ordering_sheet_job_status(doc_name, action):
+    """Last known status of a background action, for forms that poll instead of subscribing"""
+    frappe.has_permission("Ordering Sheet", "read", doc_name, throw=True)
+    return frappe.cache().get_value(f"{get_ordering_sheet_job_id(doc_name, action)}::result") or {
+        "doc_name": doc_name,
+        "action": action,
+        "status": "not_found"
+    }
@@ -0,0 +1,77 @@
+// Copyright (c) 2026, newton@upande.com
+// For license information, please see license.txt
+
+frappe.pages['endpoint-performance'].on_page_load = function(wrapper) {
+    const page = frappe.ui.make_app_page({
+        parent: wrapper,
+        title: __('Endpoint Performance'),
+        single_column: true
+    });
+
+    const $body = $('<div class="endpoint-performance"></div>').appendTo(page.main);
+
+    page.set_primary_action(__('Refresh'), () => load_stats(), 'refresh');
+    page.set_secondary_action(__('Clear Samples'), () => {
+        frappe.confirm(__('Discard all recorded samples?'), () => {
+            frappe.call({
+                method: 'upande_timaflor.instrumentation.clear_endpoint_samples',
+                callback: () => load_stats()
+            });
+        });
+    });
+
+    function load_stats() {
+        frappe.call({
+            method: 'upande_timaflor.instrumentation.get_endpoint_stats',
+            callback: function(r) {
+                if (r.message) {
+                    render(r.message);
+                }
+            }
+        });
+    }
+
+    function render(stats) {
+        $body.html(`
+            <p class="text-muted">
+                ${__('{0} of the last {1} calls', [stats.sample_count, stats.sample_size])}
+            </p>
+            <h5>${__('Per Endpoint')}</h5>
+            ${make_table(stats.endpoints, [
+                ['endpoint', __('Endpoint')],
+                ['calls', __('Calls')],
+                ['errors', __('Errors')],
+                ['p50_ms', __('p50 (ms)')],
+                ['p95_ms', __('p95 (ms)')],
+                ['max_ms', __('Max (ms)')],
+                ['avg_queries', __('Avg Queries')],
+                ['avg_rows', __('Avg Rows')],
+                ['avg_payload_bytes', __('Avg Payload (bytes)')]
+            ])}
+            <h5>${__('Slowest Recent Calls')}</h5>
+            ${make_table(stats.slowest, [
+                ['endpoint', __('Endpoint')],
+                ['ms', __('Time (ms)')],
+                ['queries', __('Queries')],
+                ['rows', __('Rows')],
+                ['payload_bytes', __('Payload (bytes)')],
+                ['user', __('User')],
+                ['at', __('At')],
+                ['error', __('Error')]
+            ])}
+        `);
+    }
+
+    function make_table(rows, columns) {
+        if (!rows.length) {
+            return `<p class="text-muted">${__('No samples recorded yet.')}</p>`;
+        }
+        const head = columns.map(([, label]) => `<th>${label}</th>`).join('');
+        const body = rows.map(row =>
+            `<tr>${columns.map(([field]) => `<td>${frappe.utils.escape_html(String(row[field] ?? ''))}</td>`).join('')}</tr>`
+        ).join('');
+        return `<table class="table table-bordered table-sm"><thead><tr>${head}</tr></thead><tbody>${body}</tbody></table>`;
+    }
+
+    load_stats();
+};
@@ -1,4 +1,8 @@
 import frappe
+from frappe.utils import flt
+
+CACHE_TTL = 24 * 60 * 60
+
 
 def execute(filters=None):
     if not filters or not filters.get("rfq"):
@@ -7,56 +11,137 @@ def execute(filters=None):
 
     rfq_name = filters["rfq"]
 
-    # Get all items from the RFQ
-    rfq_items = frappe.get_all(
-        "Request for Quotation Item",
-        filters={"parent": rfq_name},
-        fields=["item_code", "item_name", "uom"],
-        distinct=True
-    )
-
-    # Get Supplier Quotations linked to the RFQ
-    supplier_quotes = frappe.db.sql("""
-        SELECT 
-            sq.supplier,
-            sqi.item_code,
-            sqi.rate
-        FROM 
-            `tabSupplier Quotation` sq
-        INNER JOIN 
-            `tabSupplier Quotation Item` sqi ON sq.name = sqi.parent
-        WHERE 
-            request_for_quotation = %s
-        ORDER BY 
-            sq.supplier
+    # Any new, edited, cancelled or deleted quotation, or an edit to the RFQ's
+    # items, changes this key
+    latest_modified, quotation_count = get_quotation_version(rfq_name)
+    if not quotation_count:
+        frappe.msgprint("No supplier quotations found.")
+        return [], []
+
+    rfq_modified = frappe.db.get_value("Request for Quotation", rfq_name, "modified")
+    cache_key = f"upande_timaflor:sq_comparison:{rfq_name}:{rfq_modified}:{latest_modified}:{quotation_count}"
+    cached = frappe.cache().get_value(cache_key)
+    if cached:
+        return cached
+
+    result = build_comparison(rfq_name)
+    frappe.cache().set_value(cache_key, result, expires_in_sec=CACHE_TTL)
+    return result
+
+
+def get_quotation_version(rfq_name):
+    return frappe.db.sql("""
+        SELECT MAX(sq.modified), COUNT(DISTINCT sq.name)
+        FROM `tabSupplier Quotation` sq
+        INNER JOIN `tabSupplier Quotation Item` sqi ON sq.name = sqi.parent
+        WHERE sqi.request_for_quotation = %s
+    """, rfq_name)[0]
+
+
+def build_comparison(rfq_name):
+    rfq_items = frappe.db.sql("""
+        SELECT item_code, MAX(item_name) AS item_name, MAX(uom) AS uom, SUM(qty) AS qty
+        FROM `tabRequest for Quotation Item`
+        WHERE parent = %s
+        GROUP BY item_code
+        ORDER BY MIN(idx)
+    """, rfq_name, as_dict=True)
+
+    # One row per (item, supplier): the supplier's quotation line with the
+    # lowest rate, whose lead time and landed rate are reported with it, ranked
+    # per item. Rates are in company currency so suppliers quoting in different
+    # currencies compare directly; the landed rate spreads each quotation's
+    # taxes and charges over its lines.
+    quotes = frappe.db.sql("""
+        SELECT
+            item_code,
+            supplier,
+            rate,
+            lead_time_days,
+            landed_rate,
+            RANK() OVER (PARTITION BY item_code ORDER BY rate) AS rate_rank
+        FROM (
+            SELECT
+                sqi.item_code,
+                sq.supplier,
+                sqi.base_rate AS rate,
+                sqi.lead_time_days,
+                sqi.base_net_rate * IFNULL(sq.base_grand_total / NULLIF(sq.base_net_total, 0), 1) AS landed_rate,
+                ROW_NUMBER() OVER (
+                    PARTITION BY sqi.item_code, sq.supplier
+                    ORDER BY sqi.base_rate, sqi.lead_time_days, sq.modified DESC
+                ) AS supplier_rank
+            FROM `tabSupplier Quotation` sq
+            INNER JOIN `tabSupplier Quotation Item` sqi ON sq.name = sqi.parent
+            WHERE
+                sqi.request_for_quotation = %s
+                AND sq.docstatus < 2
+        ) supplier_quotes
+        WHERE supplier_rank = 1
+        ORDER BY item_code, rate_rank, supplier
     """, rfq_name, as_dict=True)
 
-    if not supplier_quotes:
+    if not quotes:
         frappe.msgprint("No supplier quotations found.")
         return [], []
 
-    # Determine unique supplier list
-    suppliers = sorted(list({q["supplier"] for q in supplier_quotes}))
-    supplier_columns = [{"label": s, "fieldname": s, "fieldtype": "Currency"} for s in suppliers]
+    suppliers = sorted({q.supplier for q in quotes})
+    item_quotes = {}
+    for q in quotes:
+        item_quotes.setdefault(q.item_code, []).append(q)
+
+    return get_columns(suppliers), get_data(rfq_items, suppliers, item_quotes)
 
-    # Define columns
+
+def get_columns(suppliers):
     columns = [
         {"label": "Item Code", "fieldname": "item_code", "fieldtype": "Data", "width": 150},
         {"label": "Item Name", "fieldname": "item_name", "fieldtype": "Data", "width": 200},
-    ] + supplier_columns
+        {"label": "Qty", "fieldname": "qty", "fieldtype": "Float", "width": 80},
+        {"label": "UOM", "fieldname": "uom", "fieldtype": "Data", "width": 80}
+    ]
+    columns += [{"label": s, "fieldname": s, "fieldtype": "Currency", "width": 120} for s in suppliers]
+    columns += [
+        {"label": "Best Supplier", "fieldname": "best_supplier", "fieldtype": "Link", "options": "Supplier", "width": 150},
+        {"label": "Best Rate", "fieldname": "best_rate", "fieldtype": "Currency", "width": 110},
+        {"label": "Lead Time (Days)", "fieldname": "lead_time_days", "fieldtype": "Int", "width": 100},
+        {"label": "Landed Total", "fieldname": "landed_total", "fieldtype": "Currency", "width": 120},
+        {"label": "Second Best Supplier", "fieldname": "second_best_supplier", "fieldtype": "Link", "options": "Supplier", "width": 150},
+        {"label": "Savings vs Second Best", "fieldname": "savings", "fieldtype": "Currency", "width": 130}
+    ]
+    return columns
 
-    # Map of (item_code, supplier) -> rate
-    rate_map = {(q["item_code"], q["supplier"]): q["rate"] for q in supplier_quotes}
 
-    # Build rows
+def get_data(rfq_items, suppliers, item_quotes):
     data = []
     for item in rfq_items:
         row = {
             "item_code": item.item_code,
-            "item_name": item.item_name
+            "item_name": item.item_name,
+            "qty": item.qty,
+            "uom": item.uom
         }
-        for supplier in suppliers:
-            row[supplier] = rate_map.get((item.item_code, supplier), None)
+        row.update(dict.fromkeys(suppliers))
+
+        ranked = item_quotes.get(item.item_code, [])
+        for q in ranked:
+            row[q.supplier] = q.rate
+
+        if ranked:
+            best = ranked[0]
+            row.update({
+                "best_supplier": best.supplier,
+                "best_rate": best.rate,
+                "lead_time_days": best.lead_time_days,
+                "landed_total": flt(best.landed_rate) * flt(item.qty)
+            })
+        if len(ranked) > 1:
+            second = ranked[1]
+            row.update({
+                "second_best_supplier": second.supplier,
+                "savings": (flt(second.rate) - flt(ranked[0].rate)) * flt(item.qty)
+            })
+
         data.append(row)
 
-    return columns, data
+    return data
@@ -2,46 +2,13 @@ import frappe
 from frappe import _
 from frappe.utils import flt
 
+from upande_timaflor.farms import get_farm_areas, get_farm_fieldname, get_farm_registry, get_greenhouses
+from upande_timaflor.items import get_agro_items
+from upande_timaflor.spray_plan import apply_spray_plan
+
 def validate_bom(doc, method):
     """BOM Validation Logic for Timaflor custom fields"""
-    for item in doc.items:
-        if not item.item_code:
-            continue
-
-        rate_type = item.get("custom_application_rate_type")
-        
-        if rate_type == "Per Hectare":
-            validate_per_hectare(item)
-        elif rate_type == "Per 100L":
-            validate_per_100l(item)
-
-def validate_per_hectare(item):
-    """Validate Per Hectare application rate requirements"""
-    if not item.get("custom_application_rate_per_ha"):
-        frappe.throw(_(f"Row {item.idx}: Application Rate (per ha) required for {item.item_code}"))
-    
-    if flt(item.custom_application_rate_per_ha) <= 0:
-        frappe.throw(_(f"Row {item.idx}: Application Rate must be > 0 for {item.item_code}"))
-    
-    if not item.get("custom_area_to_spray"):
-        frappe.throw(_(f"Row {item.idx}: Area to Spray required for {item.item_code}"))
-    
-    if item.get("custom_volume"):
-        frappe.throw(_(f"Row {item.idx}: Remove Water Volume for Per Hectare items"))
-
-def validate_per_100l(item):
-    """Validate Per 100L application volume requirements"""
-    if not item.get("custom_application_volume_per_10002000l"):
-        frappe.throw(_(f"Row {item.idx}: Application Volume (per 100L) required for {item.item_code}"))
-    
-    if flt(item.custom_application_volume_per_10002000l) <= 0:
-        frappe.throw(_(f"Row {item.idx}: Application Volume must be > 0 for {item.item_code}"))
-    
-    if not item.get("custom_volume"):
-        frappe.throw(_(f"Row {item.idx}: Water Volume required for {item.item_code}"))
-    
-    if item.get("custom_area_to_spray"):
-        frappe.throw(_(f"Row {item.idx}: Remove Area to Spray for Per 100L items"))
+    apply_spray_plan(doc)
 
 # You can add more utility functions here as needed
 # For example:
@@ -60,16 +27,35 @@ def jinja_filters():
         # "filter_name": filter_function,
     }
 
-# Example: Additional utility functions you might need
+@frappe.whitelist()
 def get_greenhouse_capacity(greenhouse_name):
-    """Get the capacity of a specific greenhouse"""
-    # Your logic here
-    pass
+    """Area of a greenhouse, from the cached Greenhouse lookup"""
+    return flt(get_greenhouses().get(greenhouse_name, {}).get("area"))
 
-def calculate_fertilizer_requirement(area, crop_type):
-    """Calculate fertilizer requirement based on area and crop"""
-    # Your logic here
-    pass
+@frappe.whitelist()
+def calculate_fertilizer_requirement(area, crop_type=None):
+    """Fertilizer needed per item for an area at each item's application rate per ha
+
+    `area` is a number of hectares, a Greenhouse or a Farm. For a farm, `crop_type`
+    limits the area to its greenhouses growing that variety.
+    """
+    if isinstance(area, str) and area in get_greenhouses():
+        area = get_greenhouse_capacity(area)
+    elif isinstance(area, str) and area in get_farm_registry():
+        area = get_farm_areas(crop_type).get(get_farm_fieldname(area), 0)
+
+    area = flt(area)
+    requirement = []
+    for item in get_agro_items("Fertilizer"):
+        rate = flt(item.application_rate)
+        if rate > 0:
+            requirement.append({
+                "item_code": item.name,
+                "item_name": item.item_name,
+                "application_rate": rate,
+                "required_qty": flt(rate * area, 3)
+            })
+    return requirement
 
 
 #material request
@@ -79,7 +65,7 @@ import json
 import frappe
 from frappe import _
 from frappe.model.mapper import get_mapped_doc
-from frappe.utils import flt
+from frappe.utils import flt, getdate
 
 
 @frappe.whitelist()
@@ -131,4 +117,103 @@ def make_material_request(source_name, target_doc=None):
         set_missing_values,
     )
 
-    return doclist
\ No newline at end of file
+    return doclist
+
+@frappe.whitelist()
+def make_material_request_from_remaining(source_names, target_doc=None):
+    """New Material Request carrying forward the unordered quantity of one or many submitted Material Requests
+
+    Remaining stock quantities are read in one query and merged per item and
+    warehouse. Item defaults for the company are fetched once for all items
+    instead of running set_missing_values over every row.
+    """
+    if isinstance(source_names, str):
+        source_names = json.loads(source_names) if source_names.startswith("[") else [source_names]
+    for name in source_names:
+        frappe.has_permission("Material Request", "read", doc=name, throw=True)
+
+    rows = frappe.db.sql("""
+        SELECT
+            mr.company, mr.material_request_type,
+            mri.item_code, mri.item_name, mri.description, mri.warehouse, mri.from_warehouse,
+            mri.uom, mri.stock_uom, mri.conversion_factor, mri.schedule_date,
+            mri.project, mri.cost_center, mri.expense_account, mri.farm,
+            mri.stock_qty - mri.ordered_qty AS remaining_qty
+        FROM `tabMaterial Request` mr
+        INNER JOIN `tabMaterial Request Item` mri ON mri.parent = mr.name
+        WHERE
+            mr.name IN %(names)s
+            AND mr.docstatus = 1
+            AND mr.status NOT IN ('Stopped', 'Closed')
+            AND mri.stock_qty > mri.ordered_qty
+        ORDER BY mr.transaction_date, mr.name, mri.idx
+    """, {"names": list(source_names) or [""]}, as_dict=1)
+
+    if not rows:
+        frappe.throw(_("Nothing left to order on the selected Material Requests"))
+    if len({(row.company, row.material_request_type) for row in rows}) > 1:
+        frappe.throw(_("Select Material Requests of the same company and type"))
+
+    if isinstance(target_doc, str):
+        target_doc = json.loads(target_doc)
+    if isinstance(target_doc, dict):
+        target_doc = frappe.get_doc(target_doc)
+    doc = target_doc or frappe.new_doc("Material Request")
+    doc.set("items", [item for item in doc.get("items") if item.item_code])
+    doc.company = doc.company or rows[0].company
+    doc.material_request_type = doc.material_request_type or rows[0].material_request_type
+
+    merged = {}
+    for row in rows:
+        key = (row.item_code, row.warehouse)
+        line = merged.get(key)
+        if not line:
+            merged[key] = row
+        else:
+            line.remaining_qty += row.remaining_qty
+            line.schedule_date = min(getdate(line.schedule_date), getdate(row.schedule_date))
+            if line.uom != row.uom:
+                # Mixed purchase units: carry the merged line in stock units
+                line.uom, line.conversion_factor = line.stock_uom, 1
+
+    defaults = get_item_defaults_map([row.item_code for row in merged.values()], doc.company)
+    today = getdate()
+    for row in merged.values():
+        item_defaults = defaults.get(row.item_code, {})
+        conversion_factor = flt(row.conversion_factor) or 1
+        doc.append("items", {
+            "item_code": row.item_code,
+            "item_name": row.item_name,
+            "description": row.description,
+            "warehouse": row.warehouse or item_defaults.get("default_warehouse"),
+            "from_warehouse": row.from_warehouse,
+            "uom": row.uom,
+            "stock_uom": row.stock_uom,
+            "conversion_factor": conversion_factor,
+            "qty": flt(row.remaining_qty) / conversion_factor,
+            "stock_qty": flt(row.remaining_qty),
+            "schedule_date": max(getdate(row.schedule_date), today),
+            "project": row.project,
+            "cost_center": row.cost_center or item_defaults.get("buying_cost_center"),
+            "expense_account": row.expense_account or item_defaults.get("expense_account"),
+            "farm": row.farm
+        })
+
+    # Rows already on the target came from the client: their dates are strings or empty
+    schedule_dates = [getdate(d) for d in (item.schedule_date for item in doc.items) if d]
+    if schedule_dates:
+        doc.schedule_date = min(schedule_dates)
+    return doc
+
+
+def get_item_defaults_map(item_codes, company):
+    """Item Default rows of a company for many items in a single query, keyed by item code"""
+    item_codes = list(set(item_codes))
+    if not item_codes:
+        return {}
+
+    defaults = frappe.get_all("Item Default",
+        filters={"parent": ["in", item_codes], "parenttype": "Item", "company": company},
+        fields=["parent", "default_warehouse", "buying_cost_center", "expense_account"]
+    )
+    return {row.parent: row for row in defaults}